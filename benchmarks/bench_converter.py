@@ -0,0 +1,52 @@
+"""
+Compares converting many small pages with a new Markdown instance per page, as
+sitegen used to do, with the reused instances of sitegen.convert.Converter.
+
+Run with `python benchmarks/bench_converter.py [number of pages]`.
+"""
+import sys
+import time
+
+from markdown import Markdown
+
+from sitegen.convert import MARKDOWN_EXTENSIONS, Converter
+
+PAGE = """title: Page {number}
+date: 09.02.2021 15:30
+tags: benchmark
+
+This is page number {number}, with *some* emphasis and a "quote".
+
+```python
+def page():
+    return {number}
+```
+"""
+
+
+def convert_new_instances(pages):
+    for page in pages:
+        Markdown(extensions=MARKDOWN_EXTENSIONS).convert(page.decode("utf-8"))
+
+
+def convert_converter(pages):
+    converter = Converter()
+    for page in pages:
+        converter.convert(page)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    pages = [PAGE.format(number=i).encode("utf-8") for i in range(count)]
+    for name, function in [
+        ("new Markdown per page", convert_new_instances),
+        ("Converter", convert_converter),
+    ]:
+        start = time.perf_counter()
+        function(pages)
+        elapsed = time.perf_counter() - start
+        print(f"{name:25} {elapsed:8.3f}s {elapsed / count * 1000:8.3f}ms/page")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Generates a synthetic site and times the phases of building it separately:
+loading the content directory, rendering the content pages, rendering the
+section and tag pages, and generating the feeds. The peak memory of every phase
+is measured in a second build with tracemalloc, as tracing slows everything
+down.
+
+Every run is appended to a results file, and compared with the last run with the
+same parameters, so that a slower version shows up.
+
+Run with `python benchmarks/bench_site.py --help` for the options.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sitegen.content import ContentContext, make_environment
+from sitegen.convert import Converter
+
+RESULTS_PATH = Path(__file__).parent / "results.json"
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua café naïve über straße"
+).split()
+CODE_BLOCK = """```python
+def function_{number}(argument):
+    \"\"\"Docstring of function {number}\"\"\"
+    values = [x * {number} for x in range(argument)]
+    return sum(values) / len(values)
+```
+"""
+TEMPLATES = {
+    "index.html": "<html><body>{{ item.html_content }}</body></html>",
+    "single.html": """<html><head><title>{{ page_content.title }}</title></head>
+<body><h1>{{ item.properties.title }}</h1>{{ item.html_content }}
+{% for tag in item.tags %}<a href="/tag/{{ tag }}">{{ tag }}</a>{% endfor %}
+</body></html>""",
+    "list.html": """<html><body><ul>
+{% for item in items %}<li><a href="{{ item.web_path }}">{{ item.properties.title }}</a>
+{{ item.description }}</li>{% endfor %}
+</ul></body></html>""",
+    "tags.html": """<html><body><ul>
+{% for item in items %}<li><a href="{{ item.web_path }}">{{ item.tag }}</a></li>{% endfor %}
+</ul></body></html>""",
+}
+CONFIG = {
+    "site": {
+        "url": "https://example.com",
+        "title": "Benchmark",
+        "author": "Bench Marker",
+        "locale": "en-US",
+    }
+}
+
+
+def make_page(rng, number, args):
+    date = datetime(2020, 1, 1) + timedelta(hours=number)
+    tags = rng.sample(range(args.tags), min(args.tags, 3)) if args.tags else []
+    lines = [
+        f"title: Page {number}",
+        f"date: {date.strftime('%d.%m.%Y %H:%M')}",
+        f"description: The description of page {number}",
+    ]
+    if tags:
+        lines.append("tags: " + ", ".join(f"tag{x}" for x in tags))
+    body = []
+    for paragraph in range(args.paragraphs):
+        body.append(" ".join(rng.choice(WORDS) for _ in range(60)))
+        if paragraph < args.code_blocks:
+            body.append(CODE_BLOCK.format(number=rng.randrange(args.pages)))
+    return "\n".join(lines) + "\n\n" + "\n\n".join(body) + "\n"
+
+
+def make_site(basedir: Path, args):
+    rng = random.Random(args.seed)
+    (basedir / "templates").mkdir(parents=True)
+    for name, template in TEMPLATES.items():
+        (basedir / "templates" / name).write_text(template)
+    contentdir = basedir / "content"
+    contentdir.mkdir()
+    (contentdir / "index.md").write_text("title: Home\n\nThe home page\n")
+    for number in range(args.pages):
+        section_dir = contentdir / f"section{number % args.sections}"
+        section_dir.mkdir(exist_ok=True)
+        encoding = args.encodings[number % len(args.encodings)]
+        page = make_page(rng, number, args)
+        (section_dir / f"page{number}.md").write_bytes(page.encode(encoding))
+
+
+def build(basedir: Path):
+    """Builds the site, yielding the name and duration of each phase"""
+    public_dir = str(basedir / "public")
+    templates = make_environment(str(basedir / "templates"))
+    converter = Converter()
+    context = None
+
+    def load():
+        nonlocal context
+        context = ContentContext.load_directory(str(basedir), converter=converter)
+
+    phases = [
+        ("load", load),
+        ("contents", lambda: context.render_contents(CONFIG, templates, public_dir)),
+        (
+            "sections_tags",
+            lambda: (
+                context.render_sections(CONFIG, templates, public_dir),
+                context.tag_collection.render(CONFIG, templates, public_dir),
+            ),
+        ),
+        ("feeds", lambda: context.feed_generator.render(CONFIG, public_dir)),
+    ]
+    for name, phase in phases:
+        start = time.perf_counter()
+        phase()
+        yield name, time.perf_counter() - start
+
+
+def measure(basedir: Path, repeat: int):
+    results = {}
+    for _ in range(repeat):
+        for name, seconds in build(basedir):
+            results.setdefault(name, {})
+            # the fastest run is the least disturbed by other processes
+            results[name]["seconds"] = min(
+                seconds, results[name].get("seconds", seconds)
+            )
+    tracemalloc.start()
+    phases = build(basedir)
+    while True:
+        tracemalloc.reset_peak()
+        try:
+            name, _ = next(phases)
+        except StopIteration:
+            break
+        results[name]["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return results
+
+
+def get_version():
+    try:
+        output = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return output.stdout.strip()
+
+
+def load_results(path: Path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return []
+
+
+def print_results(phases, previous):
+    for name, result in phases.items():
+        line = (
+            f"{name:15} {result['seconds']:8.3f}s "
+            f"{result['peak_bytes'] / 1024 / 1024:8.1f}MB peak"
+        )
+        if previous and name in previous["phases"]:
+            before = previous["phases"][name]["seconds"]
+            line += f" {(result['seconds'] - before) / before * 100:+7.1f}%"
+        print(line)
+    if previous:
+        print(f"Compared with {previous['version']} from {previous['date']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--sections", type=int, default=5)
+    parser.add_argument("--tags", type=int, default=50)
+    parser.add_argument(
+        "--paragraphs", type=int, default=10, help="paragraphs of body per page"
+    )
+    parser.add_argument(
+        "--code-blocks", type=int, default=2, help="code blocks per page"
+    )
+    parser.add_argument(
+        "--encodings",
+        type=lambda x: x.split(","),
+        default=["utf-8"],
+        help="comma separated encodings the pages are written in, in turn",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--results", type=Path, default=RESULTS_PATH)
+    args = parser.parse_args()
+
+    parameters = {
+        key: value
+        for key, value in vars(args).items()
+        if key not in ["repeat", "results"]
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        basedir = Path(workdir) / "site"
+        make_site(basedir, args)
+        phases = measure(basedir, args.repeat)
+
+    results = load_results(args.results)
+    previous = None
+    for result in reversed(results):
+        if result["parameters"] == parameters:
+            previous = result
+            break
+    print_results(phases, previous)
+    results.append(
+        {
+            "version": get_version(),
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "cpus": os.cpu_count(),
+            "parameters": parameters,
+            "phases": phases,
+        }
+    )
+    args.results.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Bookkeeping for incremental builds of sitegen
+"""
+import json
+import os
+from collections import Counter
+from pathlib import Path
+
+from sitegen.cache import CACHE_DIRNAME, CACHE_VERSION, fingerprint_bytes, write_atomic
+from sitegen.output import FileOutput
+from sitegen.profiling import measure
+from sitegen.templates import TemplateDependencies
+
+MANIFEST_FILENAME = "sitegen-manifest.json"
+# Inputs that are files of the site, as opposed to e.g. the configuration
+SOURCE_PREFIXES = ("content/", "templates/")
+
+
+def fingerprint_config(config):
+    serialized = json.dumps(config, sort_keys=True, default=str)
+    return fingerprint_bytes(serialized.encode("utf-8"))
+
+
+class Build:
+    """Keeps track of the inputs (content files, templates and configuration) each
+    output file was produced from, and a hash of its content. An output is
+    rendered again only if its inputs differ from those recorded in the previous
+    build, or if it is missing. A rendered output is written only if its content
+    changed. Outputs of the previous build that were not produced again are
+    removed."""
+
+    def __init__(
+        self,
+        basedir,
+        config,
+        templates,
+        full=False,
+        previous=None,
+        output=None,
+        profiler=None,
+        previous_templates=None,
+    ):
+        self.public_dir = os.path.join(basedir, "public")
+        self.output = output or FileOutput(self.public_dir)
+        self.state_path = Path(basedir) / CACHE_DIRNAME / "build.json"
+        self.global_inputs = {"config": fingerprint_config(config)}
+        self.manifest_sources = config["site"].get("manifest_sources", False)
+        self.full = full
+        self.profiler = profiler
+        state = {}
+        if previous is None or previous_templates is None:
+            state = self.load_state()
+        self.previous = state.get("outputs", {}) if previous is None else previous
+        if previous_templates is None and "templates" in state:
+            # So that templates that did not change are not parsed again
+            previous_templates = TemplateDependencies.from_state(state["templates"])
+        self.template_dependencies = TemplateDependencies(
+            templates, previous=previous_templates
+        )
+        self.outputs = {}
+        self.up_to_date = 0
+        self.written = 0
+        self.unchanged = 0
+        self.removed = 0
+        self.bytes_written = 0
+        # encoding -> number of content files
+        self.encodings = Counter()
+
+    def load_state(self):
+        try:
+            with open(self.state_path, encoding="utf-8") as state_file:
+                state = json.load(state_file)
+        except (OSError, ValueError):
+            return {}
+        if state.get("version") != CACHE_VERSION:
+            return {}
+        return state
+
+    def save_state(self):
+        state = {
+            "version": CACHE_VERSION,
+            "outputs": self.outputs,
+            "templates": self.template_dependencies.get_state(),
+        }
+        write_atomic(self.state_path, json.dumps(state))
+
+    def get_inputs(self, content_files, template=None):
+        inputs = dict(self.global_inputs)
+        if template is not None:
+            inputs.update(self.template_dependencies.get_inputs(template.name))
+        for content_file in content_files:
+            inputs[content_file.input_name] = content_file.fingerprint
+        return inputs
+
+    def is_stale(self, filepath, inputs):
+        output = os.path.relpath(filepath, self.public_dir)
+        previous = self.previous.get(output)
+        if self.full or not previous or previous["inputs"] != inputs:
+            return True
+        if not self.output.exists(filepath):
+            return True
+        self.outputs[output] = previous
+        self.up_to_date += 1
+        return False
+
+    def write(self, filepath, content: str, inputs):
+        with measure(self.profiler, "write"):
+            self.write_output(filepath, content, inputs)
+
+    def write_output(self, filepath, content: str, inputs):
+        output = os.path.relpath(filepath, self.public_dir)
+        data = content.encode("utf-8")
+        digest = fingerprint_bytes(data)
+        previous = self.previous.get(output)
+        if previous and not self.full:
+            unchanged = previous["hash"] == digest and self.output.exists(filepath)
+        else:
+            # Nothing from the previous build can be trusted, compare with the file
+            unchanged = self.output.has_content(filepath, data)
+        if unchanged:
+            self.unchanged += 1
+        else:
+            self.output.write(filepath, data)
+            self.written += 1
+            self.bytes_written += len(data)
+        self.outputs[output] = {"inputs": inputs, "hash": digest, "size": len(data)}
+
+    def get_manifest(self, sources=False):
+        """Content hash and size of every output for deployment tooling, and with
+        sources, the content files and templates it was generated from"""
+        outputs = {}
+        for output, record in sorted(self.outputs.items()):
+            outputs[output] = {"hash": record["hash"], "size": record["size"]}
+            if sources:
+                outputs[output]["sources"] = sorted(
+                    x for x in record["inputs"] if x.startswith(SOURCE_PREFIXES)
+                )
+        return {"version": CACHE_VERSION, "outputs": outputs}
+
+    def write_manifest(self):
+        manifest_path = os.path.join(self.public_dir, MANIFEST_FILENAME)
+        # The manifest is deployed with the site, so the sources, which are
+        # recorded in the build state anyway, are only published if asked for
+        manifest = self.get_manifest(sources=self.manifest_sources)
+        data = json.dumps(manifest, separators=(",", ":")).encode("utf-8")
+        if not self.output.has_content(manifest_path, data):
+            self.output.write(manifest_path, data)
+
+    def prune(self):
+        """Remove the outputs of the previous build that don't have a source
+        anymore, e.g. of deleted content or tags that are not used anymore"""
+        for output in set(self.previous) - set(self.outputs):
+            if self.output.remove(os.path.join(self.public_dir, output)):
+                self.removed += 1
+
+    def finish(self):
+        with measure(self.profiler, "write"):
+            self.prune()
+            if self.output.persistent:
+                self.save_state()
+            self.write_manifest()
@@ -0,0 +1,169 @@
+"""
+On-disk caches of converted Markdown and highlighted code for sitegen
+"""
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import markdown
+import pygments
+
+# Everything sitegen persists between builds lives under this directory in the site
+CACHE_DIRNAME = ".sitegen"
+# Compiled templates, below CACHE_DIRNAME
+TEMPLATE_CACHE_DIRNAME = "templates"
+# Bump this when the format of cache entries changes
+CACHE_VERSION = 3
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+
+def fingerprint_bytes(content: bytes):
+    return hashlib.sha1(content).hexdigest()
+
+
+def write_atomic(path: Path, content: str):
+    """Write to a temporary file first, so that concurrent readers never see a
+    partially written file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handle, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(handle, "w", encoding="utf-8") as tmp_file:
+            tmp_file.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class MarkdownCache:
+    """Converted HTML and parsed meta data of Markdown files, keyed on the contents
+    of the file, the Markdown extensions and encoding used and the library
+    versions"""
+
+    def __init__(self, directory, extensions, encoding=None, max_size=DEFAULT_MAX_SIZE):
+        self.directory = Path(directory)
+        self.max_size = max_size
+        salt = [str(CACHE_VERSION), markdown.__version__, pygments.__version__]
+        salt.append(encoding or "")
+        self.salt = "\0".join(salt + list(extensions)).encode("utf-8")
+        self.hits = 0
+        self.misses = 0
+
+    def get_key(self, md_bytes: bytes):
+        digest = hashlib.sha256(self.salt)
+        digest.update(b"\0")
+        digest.update(md_bytes)
+        return digest.hexdigest()
+
+    def get_path(self, key: str):
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, md_bytes: bytes):
+        path = self.get_path(self.get_key(md_bytes))
+        try:
+            with open(path, encoding="utf-8") as entry_file:
+                entry = json.load(entry_file)
+            # mark as recently used for the eviction in prune
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["html"], entry["meta"]
+
+    def set(self, md_bytes: bytes, html: str, meta):
+        path = self.get_path(self.get_key(md_bytes))
+        write_atomic(path, json.dumps({"html": html, "meta": meta}))
+
+    def prune(self):
+        prune_directory(self.directory, "*/*.json", self.max_size)
+
+
+def prune_directory(directory: Path, pattern: str, max_size: int):
+    """Remove the least recently used entries matching the pattern until they
+    fit in max_size"""
+    entries = []
+    total_size = 0
+    for entry_path in directory.glob(pattern):
+        try:
+            stat = entry_path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry_path))
+        total_size += stat.st_size
+    entries.sort()
+    for _, size, entry_path in entries:
+        if total_size <= max_size:
+            break
+        entry_path.unlink(missing_ok=True)
+        total_size -= size
+
+
+class HighlightCache:
+    """Highlighted HTML of code blocks, keyed on the lexer, the lexer and formatter
+    options and the code. Entries are kept in memory for the build, and on disk
+    between builds if a directory is given."""
+
+    def __init__(self, directory=None, max_size=DEFAULT_MAX_SIZE):
+        self.directory = Path(directory) if directory is not None else None
+        self.max_size = max_size
+        self.salt = f"{CACHE_VERSION}\0{pygments.__version__}".encode("utf-8")
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_key(self, code: str, lexer, formatter):
+        digest = hashlib.sha256(self.salt)
+        for part in [
+            type(lexer).__module__,
+            type(lexer).__qualname__,
+            repr(sorted(lexer.options.items())),
+            type(formatter).__qualname__,
+            repr(sorted(formatter.options.items())),
+        ]:
+            digest.update(b"\0")
+            digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(code.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_path(self, key: str):
+        return self.directory / key[:2] / f"{key}.html"
+
+    def get(self, key: str):
+        html = self.entries.get(key)
+        if html is None and self.directory is not None:
+            path = self.get_path(key)
+            try:
+                html = path.read_text(encoding="utf-8")
+                os.utime(path)
+            except OSError:
+                pass
+            else:
+                self.entries[key] = html
+        if html is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return html
+
+    def set(self, key: str, html: str):
+        self.entries[key] = html
+        if self.directory is not None:
+            write_atomic(self.get_path(key), html)
+
+    def highlight(self, code: str, lexer, formatter):
+        """Same as pygments.highlight, for formatters that return text"""
+        key = self.get_key(code, lexer, formatter)
+        html = self.get(key)
+        if html is None:
+            html = pygments.highlight(code, lexer, formatter)
+            if isinstance(html, str):
+                self.set(key, html)
+        return html
+
+    def prune(self):
+        if self.directory is not None:
+            prune_directory(self.directory, "*/*.html", self.max_size)
@@ -1,19 +1,40 @@
 """
 Content processing code for sitegen
 """
+import io
+import json
 import os
-from dataclasses import dataclass
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, replace
 from datetime import datetime
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional
 
-import chardet
 from furl import furl
-from jinja2 import Environment, FileSystemLoader, Markup
-from jinja2.exceptions import TemplateNotFound
-from markdown import Markdown
-
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Markup
+from jinja2.exceptions import TemplateNotFound, TemplateSyntaxError
+from markdown.extensions.meta import BEGIN_RE, END_RE, META_MORE_RE, META_RE
+
+from sitegen.build import Build
+from sitegen.cache import (
+    CACHE_DIRNAME,
+    TEMPLATE_CACHE_DIRNAME,
+    HighlightCache,
+    MarkdownCache,
+    fingerprint_bytes,
+)
+from sitegen.convert import Converter
 from sitegen.feeds import FeedGenerator
+from sitegen.index import DateIndex
+from sitegen.output import FileOutput, write_output
+from sitegen.profiling import Profiler, measure
+from sitegen.report import make_report, write_report
+from sitegen.scan import ContentScanner, is_content_filename, split_relpath, stat_key
+from sitegen.search import SearchIndex
+from sitegen.static import DEFAULT_MODE, STATIC_DIRNAME, StaticFiles
+
+DEFAULT_CONVERTER = Converter()
 
 
 @dataclass
@@ -31,6 +52,16 @@ class SiteInfo:
     section: str
 
 
+@dataclass
+class Pagination:
+    page: int
+    pages: int
+    per_page: int
+    total_items: int
+    previous_path: Optional[str]
+    next_path: Optional[str]
+
+
 class SitegenRenderError(Exception):
     pass
 
@@ -39,43 +70,188 @@ class RenderMixin:
     def get_filename(self):
         return "index.html"
 
-    def render(self, config: Dict, templates, public_dir: str):
-        context = self.get_context(config)
+    def get_output_path(self, public_dir):
+        return os.path.join(self.get_output_directory(public_dir), self.get_filename())
+
+    def prepare_render(self, templates, public_dir, build=None):
+        """Returns the template, the output path and the inputs to be recorded for
+        rendering, or None if the output of the previous build is up to date"""
         template = self.get_template(templates)
-        directory = self.get_output_directory(public_dir)
-        os.makedirs(directory, exist_ok=True)
-        filepath = os.path.join(directory, self.get_filename())
-        with open(filepath, "w", encoding='utf-8') as target_file:
-            target_file.write(template.render(**context))
+        filepath = self.get_output_path(public_dir)
+        inputs = None
+        if build is not None:
+            inputs = self.get_inputs(build, template)
+            if not build.is_stale(filepath, inputs):
+                return None
+        return template, filepath, inputs
+
+    def get_inputs(self, build, template):
+        return build.get_inputs(self.get_dependencies(), template)
+
+    def render(self, config: Dict, templates, public_dir: str, build=None):
+        prepared = self.prepare_render(templates, public_dir, build)
+        if prepared is None:
+            return
+        template, filepath, inputs = prepared
+        if build is None:
+            output = template.render(**self.get_context(config))
+            write_output(filepath, output.encode("utf-8"))
+            return
+        if build.profiler is None:
+            output = template.render(**self.get_context(config))
+        else:
+            relpath = os.path.relpath(filepath, public_dir)
+            with build.profiler.measure_page(relpath):
+                with build.profiler.measure("render", template.name):
+                    output = template.render(**self.get_context(config))
+        build.write(filepath, output, inputs)
+
+
+class PaginatedMixin(RenderMixin):
+    """For lists of content files that are split into pages of site.paginate
+    items if that is configured, the first page at the usual place and the
+    others at page/$number/ below it"""
+
+    def get_page_path(self, page):
+        if page == 1:
+            return self.web_path
+        return f"{self.web_path.rstrip('/')}/page/{page}/"
+
+    def get_pages(self, config):
+        items = self.content_files
+        per_page = config["site"].get("paginate")
+        if not per_page:
+            return [ListPage(self, items, None)]
+        pages = max(1, -(-len(items) // per_page))
+        list_pages = []
+        for page in range(1, pages + 1):
+            pagination = Pagination(
+                page=page,
+                pages=pages,
+                per_page=per_page,
+                total_items=len(items),
+                previous_path=self.get_page_path(page - 1) if page > 1 else None,
+                next_path=self.get_page_path(page + 1) if page < pages else None,
+            )
+            page_items = items[(page - 1) * per_page : page * per_page]
+            list_pages.append(ListPage(self, page_items, pagination))
+        return list_pages
+
+    def render(self, config: Dict, templates, public_dir: str, build=None):
+        for list_page in self.get_pages(config):
+            list_page.render(config, templates, public_dir, build=build)
+
+
+class ListPage(RenderMixin):
+    """A page of a section or tag list, with only the items of that page"""
+
+    def __init__(self, listing, items, pagination):
+        self.listing = listing
+        self.items = items
+        self.pagination = pagination
+
+    def get_dependencies(self):
+        return self.items
+
+    def get_inputs(self, build, template):
+        inputs = super().get_inputs(build, template)
+        if self.pagination is not None:
+            # Changes to the other items that move items onto or off this page
+            # change the items themselves; changes that don't still change the
+            # page links or the date of the listing
+            page_state = {
+                "pagination": asdict(self.pagination),
+                "date": self.listing.date_index.newest_date,
+            }
+            serialized = json.dumps(page_state, sort_keys=True, default=str)
+            inputs["pagination"] = fingerprint_bytes(serialized.encode("utf-8"))
+        return inputs
 
+    def get_context(self, config):
+        context = self.listing.get_context(config, items=self.items)
+        context["pagination"] = self.pagination
+        if self.pagination and self.pagination.page > 1:
+            path = self.listing.get_page_path(self.pagination.page)
+            context["page_content"] = replace(
+                context["page_content"],
+                canonical_url=furl(config["site"]["url"]).set(path=path).url,
+            )
+        return context
 
-def dateparse(datestr):
-    return datetime.strptime(datestr, "%d.%m.%Y %H:%M")
+    def get_template(self, templates):
+        return self.listing.get_template(templates)
+
+    def get_output_directory(self, public_dir):
+        directory = self.listing.get_output_directory(public_dir)
+        if self.pagination and self.pagination.page > 1:
+            return os.path.join(directory, "page", str(self.pagination.page))
+        return directory
 
 
-def sort_by_date(content_files):
-    return sorted(content_files, key=lambda x: x.publish_date, reverse=True)
+def dateparse(datestr):
+    return datetime.strptime(datestr, "%d.%m.%Y %H:%M")
 
 
-class Section(RenderMixin):
+def parse_front_matter(md_content):
+    """Parse the meta header of a Markdown document without converting the rest of
+    it. The rules are the same as those of the `meta` extension, so that the
+    result is identical to `Markdown.Meta` after a conversion."""
+    meta = {}
+    key = None
+    # Lines are read one by one, and only up to the end of the header; newline
+    # None translates line endings as Markdown does
+    for number, line in enumerate(io.StringIO(md_content, newline=None)):
+        line = line.rstrip("\n").expandtabs(4)
+        if number == 0 and BEGIN_RE.match(line):
+            continue
+        if line.strip() == "" or END_RE.match(line):
+            break
+        meta_match = META_RE.match(line)
+        if meta_match:
+            key = meta_match.group("key").lower().strip()
+            meta.setdefault(key, []).append(meta_match.group("value").strip())
+            continue
+        more_match = META_MORE_RE.match(line)
+        if not (more_match and key):
+            break
+        meta[key].append(more_match.group("value").strip())
+    return meta
+
+
+class Section(PaginatedMixin):
     def __init__(self, name):
         assert name
         self.name = name
-        self.content_files = []
+        self.date_index = DateIndex()
+
+    @property
+    def content_files(self):
+        """Newest first"""
+        return self.date_index.content_files
 
     def append_content_file(self, content_file):
         assert self.name == content_file.section
-        self.content_files.append(content_file)
+        self.date_index.add(content_file)
 
-    def get_context(self, config):
+    def remove_content_file(self, content_file):
+        self.date_index.remove(content_file)
+
+    def get_dependencies(self):
+        return self.content_files
+
+    @property
+    def web_path(self):
+        return f"/{self.name}/"
+
+    def get_context(self, config, items=None):
         context = {}
-        context["items"] = sort_by_date(self.content_files)
-        url = furl(config["site"]["url"]).set(path=f"/{self.name}/").url
+        context["items"] = list(self.content_files) if items is None else items
+        url = furl(config["site"]["url"]).set(path=self.web_path).url
         context["page_content"] = PageContent(
             title=self.name,
             description="",
             canonical_url=url,
-            date=max(x.publish_date for x in self.content_files),
+            date=self.date_index.newest_date,
         )
         context["site_info"] = SiteInfo(
             site_name=config["site"]["title"],
@@ -108,10 +284,24 @@ class TagCollection(RenderMixin):
                 self.content_tags[tag] = content_tag
             content_tag.append_content_file(content_file)
 
+    def remove_content_file(self, content_file):
+        for tag in content_file.tags:
+            content_tag = self.content_tags[tag]
+            content_tag.remove_content_file(content_file)
+            if not content_tag.content_files:
+                del self.content_tags[tag]
+
     @property
     def items(self):
         return sorted(self.content_tags.values(), key=lambda x: x.tag)
 
+    def get_dependencies(self):
+        content_files = {}
+        for content_tag in self.content_tags.values():
+            for content_file in content_tag.content_files:
+                content_files[content_file.input_name] = content_file
+        return list(content_files.values())
+
     def get_context(self, site_config):
         context = {}
         context["items"] = self.items
@@ -120,7 +310,7 @@ class TagCollection(RenderMixin):
             title="Tags",
             description="",
             canonical_url=url,
-            date=max(x.publish_date for x in self.items),
+            date=max(x.publish_date for x in self.content_tags.values()),
         )
         context["site_info"] = SiteInfo(
             site_name=site_config["site"]["title"],
@@ -140,22 +330,33 @@ class TagCollection(RenderMixin):
         # public/tag/
         return os.path.join(public_dir, "tag")
 
-    def render(self, config, templates, public_dir):
+    def render(self, config, templates, public_dir, build=None):
         if not self.content_tags:
             return
         for content_tag in self.content_tags.values():
-            content_tag.render(config, templates, public_dir)
-        super().render(config, templates, public_dir)
+            content_tag.render(config, templates, public_dir, build=build)
+        super().render(config, templates, public_dir, build=build)
 
 
-class ContentTag(RenderMixin):
+class ContentTag(PaginatedMixin):
     def __init__(self, tag):
         assert tag
         self.tag = tag
-        self.content_files = []
+        self.date_index = DateIndex()
+
+    @property
+    def content_files(self):
+        """Newest first"""
+        return self.date_index.content_files
 
     def append_content_file(self, content_file):
-        self.content_files.append(content_file)
+        self.date_index.add(content_file)
+
+    def remove_content_file(self, content_file):
+        self.date_index.remove(content_file)
+
+    def get_dependencies(self):
+        return self.content_files
 
     @property
     def web_path(self):
@@ -163,11 +364,11 @@ class ContentTag(RenderMixin):
 
     @property
     def publish_date(self):
-        return max(x.publish_date for x in self.content_files)
+        return self.date_index.newest_date
 
-    def get_context(self, config):
+    def get_context(self, config, items=None):
         context = {}
-        context["items"] = sort_by_date(self.content_files)
+        context["items"] = list(self.content_files) if items is None else items
         context["tag"] = self.tag
         url = furl(config["site"]["url"]).set(path=self.web_path).url
         context["page_content"] = PageContent(
@@ -193,11 +394,16 @@ class ContentTag(RenderMixin):
 
 
 class ContentContext:
-    def __init__(self):
+    def __init__(self, converter=None):
+        self.converter = converter or DEFAULT_CONVERTER
         self.content_files = []
         self.sections = {}
         self.tag_collection = TagCollection()
-        self.feed_generator = FeedGenerator()
+        # All content files by date, filled through the feed generator and shared
+        # with it; sections and tags keep their own
+        self.date_index = DateIndex()
+        self.feed_generator = FeedGenerator(self.date_index)
+        self.search_index = SearchIndex()
 
     def add_content_file(self, content_file):
         if content_file.is_draft:
@@ -206,6 +412,7 @@ class ContentContext:
         self.add_to_section(content_file)
         self.tag_collection.append_content_file(content_file)
         self.feed_generator.append_content_file(content_file)
+        self.search_index.append_content_file(content_file)
 
     def add_to_section(self, content_file):
         section_name = content_file.section
@@ -217,74 +424,175 @@ class ContentContext:
             self.sections[section_name] = section
         section.append_content_file(content_file)
 
-    def render_contents(self, config, templates, public_dir):
+    def get_content_file(self, abspath):
+        for content_file in self.content_files:
+            if content_file.abspath == Path(abspath):
+                return content_file
+        return None
+
+    def remove_content_file(self, content_file):
+        self.content_files.remove(content_file)
+        section = self.sections.get(content_file.section)
+        if section:
+            section.remove_content_file(content_file)
+            if not section.content_files:
+                del self.sections[content_file.section]
+        self.tag_collection.remove_content_file(content_file)
+        self.feed_generator.remove_content_file(content_file)
+        self.search_index.remove_content_file(content_file)
+
+    def render_contents(self, config, templates, public_dir, build=None, jobs=1):
+        if jobs == 1:
+            for content in self.content_files:
+                content.render(config, templates, public_dir, build=build)
+            return
+        to_render = []
         for content in self.content_files:
-            content.render(config, templates, public_dir)
+            prepared = content.prepare_render(templates, public_dir, build)
+            if prepared is not None:
+                to_render.append((content, prepared))
+        if not to_render:
+            return
+        # Environments cannot be pickled, so every worker process creates its own
+        # from the same templates directory, loading the templates compiled here
+        # from the bytecode cache
+        cache_dir = get_bytecode_cache_dir(templates)
+        if cache_dir is not None:
+            compile_templates(templates)
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=init_render_worker,
+            initargs=(templates.loader.searchpath, cache_dir, self.converter),
+        ) as executor:
+            tasks = [
+                (content.section, content.name, content.abspath, template.name, config)
+                for content, (template, _, _) in to_render
+            ]
+            results = executor.map(
+                render_in_worker,
+                tasks,
+                chunksize=max(1, len(tasks) // (jobs * 4)),
+            )
+            for (content, (_, filepath, inputs)), (html, output) in zip(
+                to_render, results
+            ):
+                # so that list pages don't have to convert again
+                content.html_content = html
+                if build is None:
+                    write_output(filepath, output.encode("utf-8"))
+                else:
+                    build.write(filepath, output, inputs)
 
-    def render_sections(self, config, templates, public_dir):
+    def render_sections(self, config, templates, public_dir, build=None):
         for section in self.sections.values():
-            section.render(config, templates, public_dir)
-
-    def render(self, config, templates, public_dir):
-        self.render_contents(config, templates, public_dir)
-        self.render_sections(config, templates, public_dir)
-        self.tag_collection.render(config, templates, public_dir)
-        self.feed_generator.render(config, public_dir)
+            section.render(config, templates, public_dir, build=build)
+
+    def render(self, config, templates, public_dir, build=None, jobs=1):
+        self.render_contents(config, templates, public_dir, build=build, jobs=jobs)
+        self.render_sections(config, templates, public_dir, build=build)
+        self.tag_collection.render(config, templates, public_dir, build=build)
+        profiler = build.profiler if build is not None else None
+        with measure(profiler, "feeds"):
+            self.feed_generator.render(config, public_dir, build=build)
+        with measure(profiler, "search"):
+            self.search_index.render(config, public_dir, build=build)
 
     @classmethod
-    def load_directory(cls, basedir: str):
-        content_context = cls()
-        contentdir = os.path.join(basedir, "content")
-        for root, _, files in os.walk(contentdir):
-            for filename in files:
-                if not filename.endswith(".md"):
-                    continue
-                if filename.startswith("."):
-                    # dotfiles are used for all kinds of weird purposes,
-                    # including as backup by e.g. Emacs
-                    continue
-                path = os.path.join(root, filename)
-                filename = path[len(contentdir) :].lstrip("/")
-                if "/" in filename:
-                    section, name = filename.split("/", 1)
-                else:
-                    section = ""
-                    name = filename
-                content_file = ContentFile(section=section, name=name, abspath=path)
-                content_context.add_content_file(content_file)
+    def load_directory(cls, basedir: str, converter=None, ignore=(), previous=None):
+        """Load the content files below basedir/content, skipping those matching
+        the ignore patterns. Content files of the previous context are reused if
+        their file did not change, so that they are not read again."""
+        content_context = cls(converter=converter)
+        scanner = ContentScanner(os.path.join(basedir, "content"), ignore)
+        previous_files = {}
+        if previous is not None:
+            previous_files = {x.abspath: x for x in previous.content_files}
+        for section, name, path, stat in scanner.scan():
+            content_file = previous_files.get(Path(path))
+            if content_file is None or not content_file.is_unchanged(stat):
+                content_file = ContentFile(
+                    section, name, path, converter=converter, stat=stat
+                )
+            content_context.add_content_file(content_file)
         return content_context
 
 
 class ContentFile(RenderMixin):
-    def __init__(self, section: str, name: str, abspath: str):
+    def __init__(
+        self, section: str, name: str, abspath: str, converter=None, stat=None
+    ):
         self.section = section
         self.name = name
         self.abspath = Path(abspath)
+        self.converter = converter or DEFAULT_CONVERTER
+        # As found when the content directory was scanned
+        self.stat = stat
+        self.encoding = None
         self._html_content = None
+        self._fingerprint = None
+        self._front_matter = None
         self._metadata = None
-        self._markdown = None
+
+    def is_unchanged(self, stat):
+        """Whether the file is the same as when it was scanned"""
+        return self.stat is not None and stat_key(self.stat) == stat_key(stat)
+
+    def read_bytes(self):
+        md_bytes = self.abspath.read_bytes()
+        self._fingerprint = fingerprint_bytes(md_bytes)
+        return md_bytes
+
+    def read_content(self, md_bytes=None):
+        if md_bytes is None:
+            md_bytes = self.read_bytes()
+        md_content, self.encoding = self.converter.decode(md_bytes)
+        return md_content
 
     @property
     def html_content(self):
         if self._html_content is not None:
             return self._html_content
-        md_bytes = self.abspath.read_bytes()
-        encoding = chardet.detect(md_bytes)
-        md_content = md_bytes.decode(encoding['encoding'])
-        self._markdown = Markdown(
-            extensions=["smarty", "meta", "fenced_code", "codehilite"]
-        )
-        self._html_content = Markup(self._markdown.convert(md_content))
+        html, meta = self.converter.convert(self.read_bytes())
+        self._html_content = Markup(html)
+        if self._front_matter is None:
+            self._front_matter = meta
         return self._html_content
 
+    @html_content.setter
+    def html_content(self, html):
+        self._html_content = Markup(html)
+
+    @property
+    def fingerprint(self):
+        """Hash of the contents of the file, used to detect changes between
+        builds"""
+        if self._fingerprint is None:
+            self.read_bytes()
+        return self._fingerprint
+
+    @property
+    def input_name(self):
+        return "/".join(x for x in ("content", self.section, self.name) if x)
+
+    def get_dependencies(self):
+        return [self]
+
+    @property
+    def front_matter(self):
+        """The meta header of the file, parsed without converting the body, so that
+        loading a site (and skipping drafts) does not need any Markdown work"""
+        if self._front_matter is None:
+            with measure(self.converter.profiler, "front matter"):
+                self._front_matter = parse_front_matter(self.read_content())
+        return self._front_matter
+
     @property
     def properties(self):
         if self._metadata is not None:
             return self._metadata
-        _ = self.html_content
         self._metadata = {
             key: (value[0] if isinstance(value, list) else value)
-            for (key, value) in self._markdown.Meta.items()
+            for (key, value) in self.front_matter.items()
         }
         if "title" not in self._metadata:
             self._metadata["title"] = ""
@@ -389,17 +697,250 @@ class ContentFile(RenderMixin):
         super().render(*args, **kwargs)
 
 
+def make_content_file(contentdir, path, converter=None, stat=None):
+    """The content file at path, or None if the file is not content"""
+    if not is_content_filename(os.path.basename(path)):
+        return None
+    parts = os.path.relpath(path, contentdir).split(os.sep)
+    section, name = split_relpath(parts)
+    return ContentFile(
+        section=section, name=name, abspath=path, converter=converter, stat=stat
+    )
+
+
 def to_date(dt_val):
     """Format a datetime as only date"""
     return dt_val.strftime("%d.%m.%Y")
 
 
-def generate_site(basedir, config):
-    content_context = ContentContext.load_directory(basedir)
+def make_environment(templates_dir, cache_dir=None):
+    """The template environment. With cache_dir, compiled templates are stored
+    there, so that later builds and worker processes don't compile them again."""
+    bytecode_cache = None
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(cache_dir)
     env = Environment(
-        loader=FileSystemLoader(os.path.join(basedir, "templates")), autoescape=True
+        loader=FileSystemLoader(templates_dir),
+        autoescape=True,
+        bytecode_cache=bytecode_cache,
     )
     env.filters["to_date"] = to_date
-    target = os.path.join(basedir, "public")
-    os.makedirs(target, exist_ok=True)
-    content_context.render(config, env, target)
+    return env
+
+
+def get_template_cache_dir(basedir):
+    return os.path.join(basedir, CACHE_DIRNAME, TEMPLATE_CACHE_DIRNAME)
+
+
+def get_bytecode_cache_dir(templates):
+    if templates.bytecode_cache is None:
+        return None
+    return templates.bytecode_cache.directory
+
+
+def compile_templates(templates):
+    """Compile all templates, filling the bytecode cache. Returns the number of
+    templates compiled."""
+    count = 0
+    for name in templates.list_templates():
+        try:
+            templates.get_template(name)
+        except TemplateSyntaxError:
+            # Will fail when it's rendered anyway
+            continue
+        count += 1
+    return count
+
+
+_worker_templates = None
+_worker_converter = None
+
+
+def init_render_worker(templates_dir, cache_dir, converter):
+    global _worker_templates, _worker_converter  # pylint: disable=global-statement
+    _worker_templates = make_environment(templates_dir, cache_dir)
+    _worker_converter = converter
+
+
+def render_in_worker(args):
+    section, name, abspath, template_name, config = args
+    content = ContentFile(section, name, abspath, converter=_worker_converter)
+    template = _worker_templates.get_template(template_name)
+    output = template.render(**content.get_context(config))
+    return str(content.html_content), output
+
+
+class Site:
+    """The content, templates and build state of a site, kept in memory so that
+    changes can be applied in place and the site built again, as in watch mode"""
+
+    def __init__(
+        self, basedir, config, use_cache=True, jobs=1, output=None, profiler=None
+    ):
+        self.basedir = basedir
+        self.config = config
+        self.jobs = jobs
+        self.contentdir = os.path.join(basedir, "content")
+        self.public_dir = os.path.join(basedir, "public")
+        self.converter = Converter(
+            extensions=config.get("markdown", {}).get("extensions"),
+            encoding=config["site"].get("encoding"),
+            # Repeated snippets are highlighted once even without the disk cache
+            highlight_cache=HighlightCache(),
+        )
+        self.profiler = profiler
+        self.converter.profiler = profiler
+        self.ignore = config.get("content", {}).get("ignore", [])
+        self.scanner = ContentScanner(self.contentdir, self.ignore)
+        self.content_context = None
+        if use_cache:
+            cache_dir = os.path.join(basedir, CACHE_DIRNAME)
+            self.converter.cache = MarkdownCache(
+                os.path.join(cache_dir, "markdown"),
+                self.converter.extensions,
+                self.converter.encoding,
+            )
+            self.converter.highlight_cache = HighlightCache(
+                os.path.join(cache_dir, "highlight")
+            )
+        self.full = not use_cache
+        self.output = output or FileOutput(self.public_dir)
+        # Outputs that don't survive the process start empty
+        self.previous_outputs = None if self.output.persistent else {}
+        # Static files are mirrored to the public directory on disk even if the
+        # pages are kept in memory; they are served from there
+        self.static_files = StaticFiles(
+            os.path.join(basedir, STATIC_DIRNAME),
+            self.public_dir,
+            os.path.join(basedir, CACHE_DIRNAME, "static.json"),
+            mode=config.get("static", {}).get("mode", DEFAULT_MODE),
+            full=not use_cache,
+        )
+        self.static_changed = True
+        # The environment is kept for all builds, so that in watch mode only
+        # templates that changed are compiled again
+        self.templates = make_environment(
+            os.path.join(basedir, "templates"),
+            get_template_cache_dir(basedir) if use_cache else None,
+        )
+        self.template_dependencies = None
+        self.reload_content()
+
+    def reload_content(self):
+        with measure(self.profiler, "scan"):
+            self.content_context = ContentContext.load_directory(
+                self.basedir,
+                converter=self.converter,
+                ignore=self.ignore,
+                previous=self.content_context,
+            )
+
+    def update_content(self, path):
+        """Apply the creation, modification or deletion of the file at path to the
+        content context"""
+        content_file = self.content_context.get_content_file(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stat = None
+        if content_file and stat is not None and content_file.is_unchanged(stat):
+            # e.g. more than one event for one change, or a metadata change
+            return
+        if content_file:
+            self.content_context.remove_content_file(content_file)
+        if stat is None or not self.scanner.includes(path):
+            return
+        content_file = make_content_file(
+            self.contentdir, path, converter=self.converter, stat=stat
+        )
+        if content_file:
+            self.content_context.add_content_file(content_file)
+
+    def update_static(self):
+        """Sync the static directory with the next build"""
+        self.static_changed = True
+
+    def sync_static(self, build):
+        """Mirror the static directory after the pages were rendered, so that
+        static files with the path of a generated file are skipped"""
+        if not self.static_changed:
+            return False
+        with measure(self.profiler, "static"):
+            self.static_files.sync(generated=build.outputs)
+        self.static_changed = False
+        return True
+
+    def build(self):
+        # Whatever is not part of a more specific phase, e.g. checking whether
+        # outputs are up to date
+        with measure(self.profiler, "other"):
+            build = self.render()
+            static_synced = self.sync_static(build)
+        return self.report(build, static_synced)
+
+    def render(self):
+        # Templates that changed are reloaded by the environment itself
+        build = Build(
+            self.basedir,
+            self.config,
+            self.templates,
+            full=self.full,
+            previous=self.previous_outputs,
+            output=self.output,
+            profiler=self.profiler,
+            previous_templates=self.template_dependencies,
+        )
+        os.makedirs(self.public_dir, exist_ok=True)
+        self.content_context.render(
+            self.config, self.templates, self.public_dir, build=build, jobs=self.jobs
+        )
+        build.finish()
+        self.full = False
+        self.previous_outputs = build.outputs
+        self.template_dependencies = build.template_dependencies
+        return build
+
+    def report(self, build, static_synced=False):
+        build.encodings.update(
+            x.encoding for x in self.content_context.content_files if x.encoding
+        )
+        print(
+            f"Wrote {build.written} files, skipped {build.unchanged} unchanged "
+            f"and {build.up_to_date} up-to-date files, removed {build.removed} files"
+        )
+        if set(build.encodings) - {"utf-8"}:
+            encodings = ", ".join(f"{x}: {y}" for x, y in build.encodings.items())
+            print(f"Content encodings: {encodings}")
+        static = self.static_files
+        if static_synced:
+            for relpath in static.conflicts:
+                print(f"Skipped static file {relpath}, a page is generated there")
+        if static_synced and (static.files or static.removed):
+            message = f"Placed {sum(static.placed.values())} static files"
+            modes = ", ".join(f"{x}: {y}" for x, y in static.placed.items() if y)
+            if modes:
+                message += f" ({modes})"
+            print(
+                f"{message}, skipped {static.unchanged} unchanged, "
+                f"removed {static.removed}"
+            )
+        return build
+
+
+def generate_site(
+    basedir, config, use_cache=True, jobs=1, profiler=None, report_path=None
+):
+    """Build the site in basedir. With report_path, a JSON report of the build is
+    written there, including the duration of its phases."""
+    start = time.perf_counter()
+    if report_path is not None and profiler is None:
+        profiler = Profiler()
+    site = Site(basedir, config, use_cache=use_cache, jobs=jobs, profiler=profiler)
+    build = site.build()
+    if site.converter.cache is not None:
+        site.converter.cache.prune()
+        site.converter.highlight_cache.prune()
+    if report_path is not None:
+        report = make_report(site, build, time.perf_counter() - start)
+        write_report(report_path, report)
@@ -0,0 +1,136 @@
+"""
+Decoding and conversion of Markdown content for sitegen
+"""
+import codecs
+import threading
+
+import chardet
+import pygments
+from markdown import Markdown
+from markdown.extensions import codehilite
+
+from sitegen.profiling import measure
+
+MARKDOWN_EXTENSIONS = ["smarty", "meta", "fenced_code", "codehilite"]
+# Encoding detection is slow, so it is run only on the start of a file
+DETECT_PREFIX_SIZE = 16 * 1024
+FALLBACK_ENCODING = "cp1252"
+
+# The UTF-32 BOMs start with the UTF-16 ones, so they have to be checked first
+BOMS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+
+def decode_markdown(md_bytes: bytes, encoding=None):
+    """Decode the contents of a file, returning the text and the encoding used.
+    A byte order mark is looked for first, then the given encoding is used;
+    without one, UTF-8 is tried, and only if that fails is the encoding
+    detected."""
+    for bom, bom_encoding in BOMS:
+        if md_bytes.startswith(bom):
+            return md_bytes.decode(bom_encoding), bom_encoding
+    if encoding:
+        return md_bytes.decode(encoding), encoding
+    try:
+        return md_bytes.decode("utf-8"), "utf-8"
+    except UnicodeDecodeError:
+        pass
+    samples = [md_bytes[:DETECT_PREFIX_SIZE]]
+    if len(md_bytes) > DETECT_PREFIX_SIZE:
+        # e.g. the start is only ASCII, and the rest in some other encoding
+        samples.append(md_bytes)
+    for sample in samples:
+        detected = chardet.detect(sample)["encoding"]
+        if not detected:
+            continue
+        try:
+            return md_bytes.decode(detected), detected
+        except (UnicodeDecodeError, LookupError):
+            pass
+    # Decodes almost every byte; better to have a few garbled characters than no
+    # page at all
+    return md_bytes.decode(FALLBACK_ENCODING, errors="replace"), FALLBACK_ENCODING
+
+
+# The highlight cache of the converter running in the current thread
+_active = threading.local()
+
+
+def highlight(code, lexer, formatter):
+    highlight_cache = getattr(_active, "highlight_cache", None)
+    if highlight_cache is None:
+        return pygments.highlight(code, lexer, formatter)
+    return highlight_cache.highlight(code, lexer, formatter)
+
+
+# codehilite, also used by fenced_code, has no hook for the highlighting, so the
+# function it calls is replaced for the whole process. Outside of a conversion
+# by a Converter with a highlight cache, it calls pygments as before.
+codehilite.highlight = highlight
+
+
+class Converter:
+    """Converts Markdown files with the given extensions, using the cache of
+    converted Markdown and the cache of highlighted code if there are any.
+    Setting up a Markdown instance with its extensions is expensive, so every
+    thread reuses one instance."""
+
+    def __init__(
+        self, extensions=None, encoding=None, cache=None, highlight_cache=None
+    ):
+        self.extensions = list(extensions or MARKDOWN_EXTENSIONS)
+        if "meta" not in self.extensions:
+            # Otherwise the front matter ends up in the body
+            self.extensions.append("meta")
+        self.encoding = encoding
+        self.cache = cache
+        self.highlight_cache = highlight_cache
+        self.profiler = None
+        self.local = threading.local()
+
+    def __getstate__(self):
+        # Thread locals cannot be pickled, e.g. for worker processes, and the
+        # profiler measures only the process it was created in
+        state = self.__dict__.copy()
+        del state["local"]
+        state["profiler"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.local = threading.local()
+
+    def get_markdown(self):
+        markdown = getattr(self.local, "markdown", None)
+        if markdown is None:
+            markdown = Markdown(extensions=self.extensions)
+            self.local.markdown = markdown
+        else:
+            markdown.reset()
+        return markdown
+
+    def decode(self, md_bytes: bytes):
+        return decode_markdown(md_bytes, self.encoding)
+
+    def convert(self, md_bytes: bytes):
+        """Returns the HTML and the meta data of the Markdown document"""
+        with measure(self.profiler, "markdown"):
+            if self.cache is not None:
+                cached = self.cache.get(md_bytes)
+                if cached:
+                    return cached
+            md_content, _ = self.decode(md_bytes)
+            markdown = self.get_markdown()
+            _active.highlight_cache = self.highlight_cache
+            try:
+                html = markdown.convert(md_content)
+            finally:
+                _active.highlight_cache = None
+            if self.cache is not None:
+                self.cache.set(md_bytes, html, markdown.Meta)
+            return html, markdown.Meta
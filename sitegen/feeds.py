@@ -1,48 +1,254 @@
-import datetime
+import io
+import json
 import os
+from dataclasses import dataclass, field
+from typing import List
+from xml.sax import saxutils
 
 import rfeed
 from furl import furl
 
+from sitegen.index import DateIndex
+from sitegen.output import write_output
+
+DEFAULT_LIMIT = 20
+# format -> file name of the feed
+FEED_FILENAMES = {"rss": "rss.xml", "atom": "atom.xml", "json": "feed.json"}
+
+
+def get_feed_config(config):
+    feed_config = config.get("feed", {})
+    return {
+        "limit": feed_config.get("limit", DEFAULT_LIMIT),
+        "full_content": feed_config.get("full_content", False),
+        "formats": feed_config.get("formats", ["rss"]),
+        "sections": feed_config.get("sections", True),
+        "tags": feed_config.get("tags", True),
+    }
+
+
+def format_date(date):
+    """RFC 3339 date for Atom and JSON feeds; dates without a time zone are taken
+    to be UTC, as in the RSS feed"""
+    if date.tzinfo is None:
+        return date.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return date.isoformat()
+
+
+class ContentEncoded(rfeed.Extension):
+    """The full HTML content of an RSS item"""
+
+    def __init__(self, html_content=None):
+        super().__init__()
+        self.html_content = html_content
+
+    def get_namespace(self):
+        return {"xmlns:content": "http://purl.org/rss/1.0/modules/content/"}
+
+    def publish(self, handler):
+        super().publish(handler)
+        if self.html_content is not None:
+            self._write_element("content:encoded", self.html_content)
+
+
+@dataclass
+class Feed:
+    """A feed of the site, a section or a tag, written to directory relative to
+    the public directory"""
+
+    title: str
+    directory: str
+    content_files: List = field(default_factory=list)
+
+    def get_url(self, config, feed_format):
+        url = furl(config["site"]["url"]) / self.directory / FEED_FILENAMES[feed_format]
+        return url.url
+
+    def get_page_url(self, config):
+        return furl(config["site"]["url"]).set(path=f"/{self.directory}").url
+
 
 class FeedGenerator:
-    def __init__(self):
-        self.content_files = []
+    def __init__(self, date_index=None):
+        self.date_index = DateIndex() if date_index is None else date_index
 
     def append_content_file(self, content_file):
-        self.content_files.append(content_file)
-
-    def render(self, config, public_dir):
-        feed_content = self.generate_feed(config)
-        os.makedirs(public_dir, exist_ok=True)
-        with open(os.path.join(public_dir, "rss.xml"), "w") as feed_file:
-            feed_file.write(self.generate_feed(config))
-
-    def generate_feed(self, config):
-        items = []
-        for cf in sorted(
-            self.content_files, key=lambda x: x.publish_date, reverse=True
-        ):
+        self.date_index.add(content_file)
+
+    def remove_content_file(self, content_file):
+        self.date_index.remove(content_file)
+
+    def get_feeds(self, config):
+        """The feed of the site, followed by the feeds of the sections and tags if
+        they are enabled. As the files are taken from the date index, those of
+        every feed are ordered by date as well."""
+        feed_config = get_feed_config(config)
+        site_title = config["site"]["title"]
+        site_feed = Feed(site_title, "")
+        feeds = {}
+        for cf in self.date_index:
             # skip index page
             if cf.web_path == "/":
                 continue
-            url = furl(config["site"]["url"]) / cf.web_path
-            item = rfeed.Item(
-                title=cf.properties["title"],
-                link=url,
-                description=cf.description,
-                author=config["site"]["author"],
-                guid=rfeed.Guid(url),
-                pubDate=cf.publish_date,
-            )
-            items.append(item)
-        rss_url = furl(config["site"]["url"]) / "rss.xml"
-        feed = rfeed.Feed(
-            title=f"{config['site']['title']} RSS Feed",
-            link=rss_url,
-            description=f"RSS Feed for {config['site']['title']}",
+            site_feed.content_files.append(cf)
+            keys = []
+            if feed_config["sections"] and cf.section:
+                keys.append((cf.section, cf.section))
+            if feed_config["tags"]:
+                keys.extend((tag, f"tag/{tag}") for tag in cf.tags)
+            for name, directory in keys:
+                if directory not in feeds:
+                    feeds[directory] = Feed(f"{site_title}: {name}", directory)
+                feeds[directory].content_files.append(cf)
+        return [site_feed] + list(feeds.values())
+
+    def select_items(self, feeds, limit):
+        """The newest content files of each feed, keyed on the directory of the
+        feed"""
+        return {feed.directory: feed.content_files[:limit] for feed in feeds}
+
+    def render(self, config, public_dir, build=None):
+        feed_config = get_feed_config(config)
+        feeds = self.get_feeds(config)
+        # All formats of all feeds are generated from one selection of items, and
+        # depend only on those items, not on older ones
+        items = self.select_items(feeds, feed_config["limit"])
+        for feed in feeds:
+            inputs = None
+            if build is not None:
+                inputs = build.get_inputs(items[feed.directory])
+            for feed_format in feed_config["formats"]:
+                filepath = os.path.join(
+                    public_dir, feed.directory, FEED_FILENAMES[feed_format]
+                )
+                if build is not None and not build.is_stale(filepath, inputs):
+                    continue
+                feed_content = self.generate_feed(
+                    config, feed_format, items[feed.directory], feed
+                )
+                if build is None:
+                    write_output(filepath, feed_content.encode("utf-8"))
+                else:
+                    build.write(filepath, feed_content, inputs)
+
+    def generate_feed(self, config, feed_format="rss", items=None, feed=None):
+        if feed is None:
+            feed = self.get_feeds(config)[0]
+        if items is None:
+            limit = get_feed_config(config)["limit"]
+            items = self.select_items([feed], limit)[feed.directory]
+        generate = getattr(self, f"generate_{feed_format}")
+        return generate(config, feed, items)
+
+    def get_url(self, config, content_file):
+        return (furl(config["site"]["url"]) / content_file.web_path).url
+
+    def get_updated(self, items):
+        # Not the time of the build, so that the feed changes only with its items
+        return items[0].publish_date if items else None
+
+    def generate_rss(self, config, feed, items):
+        full_content = get_feed_config(config)["full_content"]
+
+        def make_items():
+            # Items are created while the feed is written, not all up front
+            for cf in items:
+                url = self.get_url(config, cf)
+                extensions = []
+                if full_content:
+                    extensions.append(ContentEncoded(cf.html_content))
+                yield rfeed.Item(
+                    title=cf.properties["title"],
+                    link=url,
+                    description=cf.description,
+                    author=config["site"]["author"],
+                    guid=rfeed.Guid(url),
+                    pubDate=cf.publish_date,
+                    extensions=extensions,
+                )
+
+        rss_feed = rfeed.Feed(
+            title=f"{feed.title} RSS Feed",
+            link=feed.get_url(config, "rss"),
+            description=f"RSS Feed for {feed.title}",
             language=config["site"]["locale"],
-            lastBuildDate=datetime.datetime.now(),
-            items=items,
+            lastBuildDate=self.get_updated(items),
+            items=make_items(),
+            extensions=[ContentEncoded()] if full_content else [],
+        )
+        return rss_feed.rss()
+
+    def generate_atom(self, config, feed, items):
+        full_content = get_feed_config(config)["full_content"]
+        page_url = feed.get_page_url(config)
+        updated = self.get_updated(items)
+        output = io.StringIO()
+        handler = saxutils.XMLGenerator(output, "utf-8")
+
+        def write_element(name, value, attributes=None):
+            handler.startElement(name, attributes or {})
+            if value is not None:
+                handler.characters(value)
+            handler.endElement(name)
+
+        handler.startDocument()
+        handler.startElement(
+            "feed",
+            {
+                "xmlns": "http://www.w3.org/2005/Atom",
+                "xml:lang": config["site"]["locale"],
+            },
         )
-        return feed.rss()
+        write_element("title", feed.title)
+        write_element("id", page_url)
+        write_element("link", None, {"href": page_url})
+        write_element(
+            "link", None, {"href": feed.get_url(config, "atom"), "rel": "self"}
+        )
+        if updated:
+            write_element("updated", format_date(updated))
+        handler.startElement("author", {})
+        write_element("name", config["site"]["author"])
+        handler.endElement("author")
+        for cf in items:
+            url = self.get_url(config, cf)
+            handler.startElement("entry", {})
+            write_element("title", cf.properties["title"])
+            write_element("id", url)
+            write_element("link", None, {"href": url})
+            write_element("updated", format_date(cf.publish_date))
+            if cf.description:
+                write_element("summary", cf.description)
+            if full_content:
+                write_element("content", cf.html_content, {"type": "html"})
+            handler.endElement("entry")
+        handler.endElement("feed")
+        handler.endDocument()
+        return output.getvalue()
+
+    def generate_json(self, config, feed, items):
+        full_content = get_feed_config(config)["full_content"]
+        json_items = []
+        for cf in items:
+            url = self.get_url(config, cf)
+            item = {
+                "id": url,
+                "url": url,
+                "title": cf.properties["title"],
+                "date_published": format_date(cf.publish_date),
+            }
+            if cf.description:
+                item["summary"] = cf.description
+            if full_content:
+                item["content_html"] = cf.html_content
+            json_items.append(item)
+        json_feed = {
+            "version": "https://jsonfeed.org/version/1.1",
+            "title": feed.title,
+            "home_page_url": feed.get_page_url(config),
+            "feed_url": feed.get_url(config, "json"),
+            "language": config["site"]["locale"],
+            "authors": [{"name": config["site"]["author"]}],
+            "items": json_items,
+        }
+        return json.dumps(json_feed, ensure_ascii=False, indent=2)
@@ -0,0 +1,48 @@
+"""
+Date-ordered index of content files for sitegen
+"""
+
+
+class DateIndex:
+    """Content files ordered by publish date, newest first. Files are inserted at
+    their place when they are added, so the order never has to be computed again,
+    and the publish date of each file is read only once."""
+
+    def __init__(self, content_files=()):
+        self.dates = []
+        self.content_files = []
+        for content_file in content_files:
+            self.add(content_file)
+
+    def __len__(self):
+        return len(self.content_files)
+
+    def __iter__(self):
+        return iter(self.content_files)
+
+    def add(self, content_file):
+        date = content_file.publish_date
+        # After all newer files and files of the same date, so that files of the
+        # same date stay in the order they were added, as with sorted()
+        low, high = 0, len(self.dates)
+        while low < high:
+            middle = (low + high) // 2
+            if self.dates[middle] >= date:
+                low = middle + 1
+            else:
+                high = middle
+        self.dates.insert(low, date)
+        self.content_files.insert(low, content_file)
+
+    def remove(self, content_file):
+        # Not searched by date, as that could have changed since it was added
+        for index, indexed in enumerate(self.content_files):
+            if indexed is content_file:
+                del self.dates[index]
+                del self.content_files[index]
+                return
+        raise ValueError(f"{content_file} is not in the index")
+
+    @property
+    def newest_date(self):
+        return self.dates[0] if self.dates else None
@@ -1,14 +1,22 @@
 """
 Console entry points of sitegen
 """
+import codecs
+import cProfile
 import os
 
 import click
 import toml
-from schema import And, Regex, Schema, SchemaError
+from schema import And, Optional, Or, Regex, Schema, SchemaError
 
-from sitegen.content import generate_site
-from sitegen.monitor import monitor
+from sitegen.content import (
+    compile_templates,
+    generate_site,
+    get_template_cache_dir,
+    make_environment,
+)
+from sitegen.monitor import DEFAULT_DELAY, monitor
+from sitegen.profiling import Profiler
 
 
 @click.group()
@@ -16,6 +24,14 @@ def main():
     pass
 
 
+def is_encoding(name):
+    try:
+        codecs.lookup(name)
+    except LookupError:
+        return False
+    return True
+
+
 ConfigSchema = Schema(
     {
         "site": {
@@ -23,7 +39,23 @@ ConfigSchema = Schema(
             "title": And(str, len),
             "author": And(str, len),
             "locale": And(str, len),
-        }
+            Optional("encoding"): And(str, is_encoding),
+            Optional("paginate"): And(int, lambda x: x > 0),
+            Optional("manifest_sources"): bool,
+        },
+        Optional("content"): {Optional("ignore"): [And(str, len)]},
+        Optional("markdown"): {Optional("extensions"): [And(str, len)]},
+        Optional("feed"): {
+            Optional("limit"): And(int, lambda x: x > 0),
+            Optional("full_content"): bool,
+            Optional("formats"): [Or("rss", "atom", "json")],
+            Optional("sections"): bool,
+            Optional("tags"): bool,
+        },
+        Optional("static"): {
+            Optional("mode"): Or("auto", "reflink", "hardlink", "copy")
+        },
+        Optional("search"): {Optional("prefix_length"): And(int, lambda x: x > 0)},
     }
 )
 
@@ -42,12 +74,95 @@ def load_config():
 
 
 @main.command()
-def generate():
+@click.option(
+    "--no-cache", is_flag=True, help="Convert and render everything from scratch"
+)
+@click.option(
+    "--jobs",
+    "-j",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of processes to render content pages with",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Report the time spent in each phase and the slowest templates and pages",
+)
+@click.option(
+    "--profile-top",
+    default=10,
+    type=click.IntRange(min=1),
+    help="Number of slowest templates and pages to list with --profile",
+)
+@click.option(
+    "--profile-output",
+    type=click.Path(dir_okay=False, writable=True),
+    help="With --profile, write cProfile statistics to this file for pstats",
+)
+@click.option(
+    "--report",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write a JSON report of the build to this file",
+)
+def generate(no_cache, jobs, profile, profile_top, profile_output, report):
     config = load_config()
-    generate_site(os.getcwd(), config)
+    if not profile:
+        generate_site(
+            os.getcwd(), config, use_cache=not no_cache, jobs=jobs, report_path=report
+        )
+        return
+    if jobs > 1:
+        # Worker processes would not be measured
+        click.echo("Profiling renders in a single process, ignoring --jobs")
+    profiler = Profiler()
+    stats = cProfile.Profile() if profile_output else None
+    if stats is not None:
+        stats.enable()
+    try:
+        generate_site(
+            os.getcwd(),
+            config,
+            use_cache=not no_cache,
+            jobs=1,
+            profiler=profiler,
+            report_path=report,
+        )
+    finally:
+        if stats is not None:
+            stats.disable()
+            stats.dump_stats(profile_output)
+    click.echo(profiler.report(profile_top))
+
+
+@main.command(name="compile-templates")
+def compile_templates_command():
+    """Compile the templates ahead of the next build"""
+    basedir = os.getcwd()
+    templates = make_environment(
+        os.path.join(basedir, "templates"), get_template_cache_dir(basedir)
+    )
+    count = compile_templates(templates)
+    click.echo(f"Compiled {count} templates")
 
 
 @main.command()
-def watch():
+@click.option(
+    "--delay",
+    default=DEFAULT_DELAY,
+    type=click.FloatRange(min=0),
+    help="Seconds to wait for further changes before regenerating",
+)
+@click.option(
+    "--in-memory",
+    is_flag=True,
+    help="Keep the generated site in memory instead of writing it to public",
+)
+@click.option(
+    "--flush",
+    is_flag=True,
+    help="With --in-memory, write the generated site to public in the background",
+)
+def watch(delay, in_memory, flush):
     config = load_config()
-    monitor(os.getcwd(), config)
+    monitor(os.getcwd(), config, delay=delay, in_memory=in_memory, flush=flush)
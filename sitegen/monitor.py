@@ -1,65 +1,244 @@
 """
 Directory monitory functionality for sitegen
 """
-import socketserver
+import email.utils
+import io
+import os
+import threading
+import time
 import traceback
-from http.server import SimpleHTTPRequestHandler
+import urllib.parse
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 
 from watchdog.events import FileSystemEventHandler
 from watchdog.observers import Observer
 
-from sitegen.content import generate_site
+from sitegen.content import Site
+from sitegen.output import MemoryOutput
+from sitegen.static import STATIC_DIRNAME
 
 PORT = 8000
+# Seconds without file system events before the site is built
+DEFAULT_DELAY = 0.3
+# The directories of the site that sitegen reads
+WATCHED_DIRNAMES = ["content", "templates", STATIC_DIRNAME]
 
 
 class RequestHandler(SimpleHTTPRequestHandler):
+    """Serves files with ETag and Last-Modified headers, answering conditional
+    requests with 304 Not Modified, and keeps connections alive. Files in STORE,
+    if set, are served from memory instead of from the disk."""
+
     BASE = None
+    STORE = None
+    protocol_version = "HTTP/1.1"
 
     def __init__(self, *args, **kwargs):
         kwargs["directory"] = self.BASE
         super().__init__(*args, **kwargs)
 
+    def get_file_path(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and self.path.split("?", 1)[0].endswith("/"):
+            path = os.path.join(path, "index.html")
+        return path
+
+    def is_not_modified(self, etag, mtime):
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match:
+            etags = [x.strip() for x in if_none_match.split(",")]
+            return etag in etags or "*" in etags
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since and mtime is not None:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            return int(mtime) <= since.timestamp()
+        return False
+
+    def send_from_store(self):
+        """Serve the requested file from memory. Returns None if it's not there"""
+        urlpath = urllib.parse.unquote(self.path.split("?", 1)[0].split("#", 1)[0])
+        relpath = urlpath.lstrip("/")
+        if not relpath or relpath.endswith("/"):
+            relpath += "index.html"
+        stored = self.STORE.get(relpath)
+        if stored is None:
+            if self.STORE.get(f"{relpath}/index.html") is None:
+                return None
+            self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+            self.send_header("Location", f"{urlpath}/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return io.BytesIO()
+        data, fingerprint = stored
+        etag = f'"{fingerprint}"'
+        if self.is_not_modified(etag, None):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return io.BytesIO()
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-type", self.guess_type(relpath))
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        return io.BytesIO(data)
+
+    def send_head(self):
+        if self.STORE is not None:
+            source = self.send_from_store()
+            if source is not None:
+                return source
+        path = self.get_file_path()
+        if not os.path.isfile(path):
+            # Directory redirects and listings, and errors
+            return super().send_head()
+        try:
+            source = open(path, "rb")  # pylint: disable=consider-using-with
+        except OSError:
+            return super().send_head()
+        stat = os.fstat(source.fileno())
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        if self.is_not_modified(etag, stat.st_mtime):
+            source.close()
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return None
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-type", self.guess_type(path))
+        self.send_header("Content-Length", str(stat.st_size))
+        self.send_header("Last-Modified", self.date_time_string(stat.st_mtime))
+        self.send_header("ETag", etag)
+        # The browser should check every time whether the page was regenerated
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        return source
+
+    def copyfile(self, source, outputfile):
+        if isinstance(source, io.BytesIO):
+            outputfile.write(source.getvalue())
+            return
+        # Let the kernel copy from the file to the socket where possible
+        self.connection.sendfile(source)
+
 
 class EventHandler(FileSystemEventHandler):
-    def __init__(self, basedir, context):
-        self.basedir = basedir
-        self.context = context
+    """Collects file system events until there have been none for `delay` seconds,
+    and then applies all of them to the site with a single build in a separate
+    thread. Events that arrive during a build are collected for the next one."""
+
+    def __init__(self, site, delay=DEFAULT_DELAY):
+        self.site = site
+        self.basedir = site.basedir
+        self.delay = delay
+        # path -> top level directory, so that repeated events count once
+        self.pending = {}
+        self.reload_content = False
+        self.last_event = 0.0
+        self.condition = threading.Condition()
+
+    def get_dirname(self, eventpath):
+        """The top level directory of the site the path is in, if it is relevant"""
+        if eventpath.name.startswith(".#"):
+            # Emacs backup file
+            return None
+        try:
+            relpath = eventpath.relative_to(self.basedir)
+        except ValueError:
+            # moved out of the site
+            return None
+        dirname = relpath.parts[0]
+        if dirname not in WATCHED_DIRNAMES:
+            return None
+        return dirname
 
     def dispatch(self, event):
-        if (
-            event.event_type not in ["created", "modified", "deleted"]
-            or event.is_directory
-        ):
+        if event.event_type not in ["created", "modified", "deleted", "moved"]:
             return
-        eventpath = Path(event.src_path)
-        filename = eventpath.name
-        if filename.startswith(".#"):
-            # Emacs backup file
+        if event.is_directory and event.event_type == "modified":
             return
-        relpath = eventpath.relative_to(self.basedir)
-        dirname = relpath.parts[0]
-        if dirname not in ["content", "templates"]:
+        eventpaths = [Path(event.src_path)]
+        if event.event_type == "moved":
+            # Editors often save by moving a temporary file over the original
+            eventpaths.append(Path(event.dest_path))
+        changed = [(x, self.get_dirname(x)) for x in eventpaths]
+        changed = [(x, dirname) for x, dirname in changed if dirname]
+        if not changed:
             return
-        print(f"{dirname.capitalize()} directory changed, regenerating")
+        with self.condition:
+            for eventpath, dirname in changed:
+                self.pending[eventpath] = dirname
+                if event.is_directory and dirname == "content":
+                    self.reload_content = True
+            self.last_event = time.monotonic()
+            self.condition.notify()
+
+    def take_changes(self):
+        """Wait for events, and then until no events arrived for `delay` seconds.
+        Returns the changed paths and whether the content has to be reloaded."""
+        with self.condition:
+            while not self.pending:
+                self.condition.wait()
+            while True:
+                remaining = self.last_event + self.delay - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            changes, self.pending = self.pending, {}
+            reload_content, self.reload_content = self.reload_content, False
+        return changes, reload_content
+
+    def apply_changes(self, changes, reload_content):
+        for dirname in sorted(set(changes.values())):
+            print(f"{dirname.capitalize()} directory changed, regenerating")
         try:
-            generate_site(self.basedir, self.context)
+            if STATIC_DIRNAME in changes.values():
+                self.site.update_static()
+            if reload_content:
+                self.site.reload_content()
+            else:
+                for eventpath, dirname in changes.items():
+                    # Templates are reloaded by the environment when rendering
+                    if dirname == "content":
+                        self.site.update_content(eventpath)
+            self.site.build()
         except:  # pylint: disable=bare-except
             print("Error generating site:")
             traceback.print_exc()
 
+    def run(self):
+        while True:
+            self.apply_changes(*self.take_changes())
+
 
-def monitor(basedir, context):
+def monitor(basedir, context, delay=DEFAULT_DELAY, in_memory=False, flush=False):
     basedirectory = Path(basedir)
     public = basedirectory / "public"
 
+    output = None
+    if in_memory:
+        output = MemoryOutput(str(public), flush=flush)
+        RequestHandler.STORE = output
+    site = Site(basedir, context, output=output)
+    site.build()
+    event_handler = EventHandler(site, delay=delay)
+    threading.Thread(target=event_handler.run, daemon=True).start()
     observer = Observer()
-    observer.schedule(EventHandler(basedir, context), basedirectory, recursive=True)
+    # Watch only the directories sitegen reads, so that writing to public does
+    # not generate any events
+    for dirname in WATCHED_DIRNAMES:
+        if (basedirectory / dirname).is_dir():
+            observer.schedule(event_handler, basedirectory / dirname, recursive=True)
     observer.start()
 
     RequestHandler.BASE = public
-    with socketserver.TCPServer(("", PORT), RequestHandler) as httpd:
+    with ThreadingHTTPServer(("", PORT), RequestHandler) as httpd:
         print(f"Serving at http://localhost:{PORT}")
         try:
             httpd.serve_forever()
@@ -0,0 +1,132 @@
+"""
+Writing of the generated files of sitegen
+"""
+import os
+import queue
+import threading
+import uuid
+from pathlib import Path
+
+from sitegen.cache import fingerprint_bytes
+
+
+def write_output(filepath, data: bytes):
+    """Write to a temporary file that replaces the target, so that a target that
+    is hardlinked, e.g. to a static file, is never written through"""
+    directory = os.path.dirname(filepath)
+    os.makedirs(directory, exist_ok=True)
+    # Not with mkstemp, which creates the file only readable by the owner
+    tmp_path = os.path.join(directory, f".tmp-{uuid.uuid4().hex}")
+    try:
+        with open(tmp_path, "xb") as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def has_content(filepath, data: bytes):
+    """Whether the file exists with exactly this content. The size is compared
+    first, so that most changed files don't have to be read."""
+    try:
+        if os.path.getsize(filepath) != len(data):
+            return False
+        with open(filepath, "rb") as existing_file:
+            return existing_file.read() == data
+    except OSError:
+        return False
+
+
+def remove_output(filepath, public_dir):
+    """Remove the file, and the directories that become empty up to public_dir.
+    Returns whether the file existed."""
+    filepath = Path(filepath)
+    try:
+        filepath.unlink()
+    except FileNotFoundError:
+        return False
+    directory = filepath.parent
+    while directory != Path(public_dir) and not any(directory.iterdir()):
+        directory.rmdir()
+        directory = directory.parent
+    return True
+
+
+class FileOutput:
+    """Generated files are written to the public directory"""
+
+    # Whether the outputs survive the process, and can be reused by the next build
+    persistent = True
+
+    def __init__(self, public_dir):
+        self.public_dir = public_dir
+
+    def exists(self, filepath):
+        return os.path.exists(filepath)
+
+    def has_content(self, filepath, data: bytes):
+        return has_content(filepath, data)
+
+    def write(self, filepath, data: bytes):
+        write_output(filepath, data)
+
+    def remove(self, filepath):
+        return remove_output(filepath, self.public_dir)
+
+
+class MemoryOutput:
+    """Generated files are kept in memory, keyed on their path relative to the
+    public directory, so that they can be served without touching the disk. If
+    flush is set, they are also written to the public directory in a background
+    thread."""
+
+    persistent = False
+
+    def __init__(self, public_dir, flush=False):
+        self.public_dir = public_dir
+        # relative path -> (content, fingerprint of content)
+        self.files = {}
+        self.lock = threading.Lock()
+        self.flush_queue = None
+        if flush:
+            self.flush_queue = queue.Queue()
+            threading.Thread(target=self.run_flush, daemon=True).start()
+
+    def get_relpath(self, filepath):
+        return os.path.relpath(filepath, self.public_dir)
+
+    def get(self, relpath):
+        """Content and fingerprint of the file, or None if it does not exist"""
+        with self.lock:
+            return self.files.get(relpath)
+
+    def exists(self, filepath):
+        return self.get(self.get_relpath(filepath)) is not None
+
+    def has_content(self, filepath, data: bytes):
+        stored = self.get(self.get_relpath(filepath))
+        return stored is not None and stored[0] == data
+
+    def write(self, filepath, data: bytes):
+        with self.lock:
+            self.files[self.get_relpath(filepath)] = (data, fingerprint_bytes(data))
+        if self.flush_queue is not None:
+            self.flush_queue.put((filepath, data))
+
+    def remove(self, filepath):
+        with self.lock:
+            existed = self.files.pop(self.get_relpath(filepath), None) is not None
+        if self.flush_queue is not None:
+            self.flush_queue.put((filepath, None))
+        return existed
+
+    def run_flush(self):
+        while True:
+            filepath, data = self.flush_queue.get()
+            if data is None:
+                remove_output(filepath, self.public_dir)
+            elif not has_content(filepath, data):
+                write_output(filepath, data)
+            self.flush_queue.task_done()
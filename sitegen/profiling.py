@@ -0,0 +1,91 @@
+"""
+Measuring where the time of a sitegen build goes
+"""
+import contextlib
+import time
+from collections import defaultdict
+
+
+def measure(profiler, phase, template=None):
+    """Context manager timing the phase if there is a profiler"""
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.measure(phase, template)
+
+
+class Profiler:
+    """Wall and CPU time of the phases of a build, of rendering each template and
+    of each page. Phases can be nested, e.g. converting Markdown while a
+    template is rendered; the time of the inner phase is then not counted for
+    the outer one, so the phases add up to the total."""
+
+    def __init__(self):
+        # phase -> [wall seconds, CPU seconds]
+        self.phases = defaultdict(lambda: [0.0, 0.0])
+        # template name -> [wall seconds, number of renders]
+        self.templates = defaultdict(lambda: [0.0, 0])
+        # output path -> wall seconds
+        self.pages = {}
+        self.stack = []
+
+    def charge(self, now, now_cpu):
+        """Add the time since the innermost running phase was (re)started to it"""
+        phase, started, started_cpu = self.stack[-1]
+        self.phases[phase][0] += now - started
+        self.phases[phase][1] += now_cpu - started_cpu
+
+    @contextlib.contextmanager
+    def measure(self, phase, template=None):
+        start, start_cpu = time.perf_counter(), time.process_time()
+        if self.stack:
+            self.charge(start, start_cpu)
+        self.stack.append((phase, start, start_cpu))
+        try:
+            yield
+        finally:
+            end, end_cpu = time.perf_counter(), time.process_time()
+            self.charge(end, end_cpu)
+            self.stack.pop()
+            if self.stack:
+                # restart the clock of the outer phase
+                self.stack[-1] = (self.stack[-1][0], end, end_cpu)
+            if template is not None:
+                self.templates[template][0] += end - start
+                self.templates[template][1] += 1
+
+    @contextlib.contextmanager
+    def measure_page(self, output):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.pages[output] = time.perf_counter() - start
+
+    def get_phases(self):
+        return {
+            phase: {"wall": wall, "cpu": cpu}
+            for phase, (wall, cpu) in self.phases.items()
+        }
+
+    def report(self, count=10):
+        lines = [f"{'Phase':20} {'Wall':>10} {'CPU':>10}"]
+        for phase, (wall, cpu) in sorted(
+            self.phases.items(), key=lambda x: x[1][0], reverse=True
+        ):
+            lines.append(f"{phase:20} {wall:9.3f}s {cpu:9.3f}s")
+        total_wall = sum(x[0] for x in self.phases.values())
+        total_cpu = sum(x[1] for x in self.phases.values())
+        lines.append(f"{'total':20} {total_wall:9.3f}s {total_cpu:9.3f}s")
+        lines.append("")
+        lines.append(f"Slowest {count} templates (total, renders, mean):")
+        for name, (wall, renders) in sorted(
+            self.templates.items(), key=lambda x: x[1][0], reverse=True
+        )[:count]:
+            lines.append(f"{wall:9.3f}s {renders:6} {wall / renders:9.4f}s  {name}")
+        lines.append("")
+        lines.append(f"Slowest {count} pages:")
+        for output, wall in sorted(
+            self.pages.items(), key=lambda x: x[1], reverse=True
+        )[:count]:
+            lines.append(f"{wall:9.4f}s  {output}")
+        return "\n".join(lines)
@@ -0,0 +1,81 @@
+"""
+Machine-readable reports of sitegen builds
+"""
+import json
+import sys
+from pathlib import Path
+
+from sitegen.cache import write_atomic
+from sitegen.feeds import get_feed_config
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Bump this when fields of the report are removed or change meaning
+REPORT_VERSION = 1
+
+
+def get_peak_rss():
+    """Peak resident set size in bytes of this process and of the worker processes
+    it waited for, or None where it cannot be read"""
+    if resource is None:
+        return None
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # Kilobytes everywhere but on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def get_cache_stats(cache):
+    if cache is None:
+        return None
+    lookups = cache.hits + cache.misses
+    return {
+        "hits": cache.hits,
+        "misses": cache.misses,
+        "hit_rate": cache.hits / lookups if lookups else None,
+    }
+
+
+def make_report(site, build, duration):
+    context = site.content_context
+    feed_config = get_feed_config(site.config)
+    feeds = context.feed_generator.get_feeds(site.config)
+    profiler = site.profiler
+    return {
+        "version": REPORT_VERSION,
+        "duration": duration,
+        "jobs": site.jobs,
+        "counts": {
+            "pages": len(context.content_files),
+            "sections": len(context.sections),
+            "tags": len(context.tag_collection.content_tags),
+            "feeds": len(feeds) * len(feed_config["formats"]),
+        },
+        "files": {
+            "written": build.written,
+            "unchanged": build.unchanged,
+            "up_to_date": build.up_to_date,
+            "removed": build.removed,
+            "bytes_written": build.bytes_written,
+        },
+        "static": {
+            "placed": site.static_files.placed,
+            "unchanged": site.static_files.unchanged,
+            "removed": site.static_files.removed,
+        },
+        "caches": {
+            "markdown": get_cache_stats(site.converter.cache),
+            "highlight": get_cache_stats(site.converter.highlight_cache),
+        },
+        "peak_rss": get_peak_rss(),
+        "phases": profiler.get_phases() if profiler is not None else None,
+    }
+
+
+def write_report(path, report):
+    write_atomic(Path(path), json.dumps(report, indent=2))
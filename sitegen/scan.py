@@ -0,0 +1,118 @@
+"""
+Discovery of content files for sitegen
+"""
+import fnmatch
+import os
+
+# Everything below these directories is a draft, so they are not even looked at
+DRAFT_DIRNAMES = ["drafts", "draft"]
+
+
+def is_content_filename(filename):
+    # dotfiles are used for all kinds of weird purposes, including as backup by
+    # e.g. Emacs
+    return filename.endswith(".md") and not filename.startswith(".")
+
+
+def stat_key(stat):
+    """The parts of a stat result that change when the file is modified; not the
+    access time, which reading the file changes"""
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+class IgnorePatterns:
+    """Glob patterns of paths below the content directory to skip, as in
+    .gitignore: a pattern ending with a slash matches only directories, a pattern
+    with a slash anywhere else matches the path relative to the content
+    directory, and any other pattern matches names at any depth. Negated patterns
+    are not supported."""
+
+    def __init__(self, patterns=()):
+        self.names = []
+        self.paths = []
+        self.dir_names = []
+        self.dir_paths = []
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if not pattern or pattern.startswith("#"):
+                continue
+            only_dirs = pattern.endswith("/")
+            pattern = pattern.rstrip("/")
+            anchored = "/" in pattern
+            pattern = pattern.lstrip("/")
+            if only_dirs:
+                (self.dir_paths if anchored else self.dir_names).append(pattern)
+            else:
+                (self.paths if anchored else self.names).append(pattern)
+
+    def matches(self, relpath, is_dir=False):
+        """Whether the path relative to the content directory, with slashes as
+        separators, is ignored"""
+        name = relpath.rsplit("/", 1)[-1]
+        names, paths = self.names, self.paths
+        if is_dir:
+            names, paths = names + self.dir_names, paths + self.dir_paths
+        return any(fnmatch.fnmatchcase(name, x) for x in names) or any(
+            fnmatch.fnmatchcase(relpath, x) for x in paths
+        )
+
+
+class ContentScanner:
+    """Finds the content files below a content directory with os.scandir. Draft
+    and ignored directories are pruned before descending into them, and only
+    content files are stat'ed, so that other files, e.g. large attachments, are
+    never looked at."""
+
+    def __init__(self, contentdir, ignore=()):
+        self.contentdir = contentdir
+        self.ignore = IgnorePatterns(ignore)
+
+    def scan(self):
+        """Yields the section, name, path and stat result of every content file"""
+        # (directory, path parts relative to the content directory)
+        stack = [(self.contentdir, [])]
+        while stack:
+            directory, parts = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                entry_parts = parts + [entry.name]
+                relpath = "/".join(entry_parts)
+                if entry.is_dir():
+                    # Symbolic links to directories are not followed, as with
+                    # os.walk
+                    if entry.is_symlink() or entry.name in DRAFT_DIRNAMES:
+                        continue
+                    if not self.ignore.matches(relpath, is_dir=True):
+                        stack.append((entry.path, entry_parts))
+                    continue
+                if not is_content_filename(entry.name):
+                    continue
+                if self.ignore.matches(relpath) or not entry.is_file():
+                    continue
+                section, name = split_relpath(entry_parts)
+                yield section, name, entry.path, entry.stat()
+
+    def includes(self, path):
+        """Whether the file at path would be found by scan, for single files that
+        changed, as in watch mode"""
+        relpath = os.path.relpath(path, self.contentdir)
+        parts = relpath.split(os.sep)
+        if parts[0] == os.pardir or not is_content_filename(parts[-1]):
+            return False
+        for index in range(1, len(parts)):
+            if parts[index - 1] in DRAFT_DIRNAMES:
+                return False
+            if self.ignore.matches("/".join(parts[:index]), is_dir=True):
+                return False
+        return not self.ignore.matches("/".join(parts))
+
+
+def split_relpath(parts):
+    """The section and name of the content file at the given path parts relative
+    to the content directory"""
+    if len(parts) == 1:
+        return "", parts[0]
+    return parts[0], "/".join(parts[1:])
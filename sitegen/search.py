@@ -0,0 +1,119 @@
+"""
+Client-side search index for sitegen
+"""
+import html
+import json
+import os
+import re
+from collections import Counter, defaultdict
+
+from sitegen.cache import fingerprint_bytes
+from sitegen.output import write_output
+
+SEARCH_DIRNAME = "search"
+DEFAULT_PREFIX_LENGTH = 2
+# Bump this when the format of the index changes, so that clients can check it
+INDEX_VERSION = 1
+
+TAG_RE = re.compile(r"<[^>]+>")
+WORD_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Lower case words of at least two characters"""
+    return [x for x in WORD_RE.findall(text.lower()) if len(x) > 1]
+
+
+def html_to_text(html_content):
+    return html.unescape(TAG_RE.sub(" ", html_content))
+
+
+def dump_json(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+
+
+class SearchIndex:
+    """An inverted index of the title, description and body of the content files,
+    split into shards by the first characters of the terms, so that a browser
+    has to download only the shards for the terms it searches. The manifest
+    search/index.json lists the documents and the shards; each shard
+    search/shards/$prefix.json maps terms to lists of [document number, term
+    count]."""
+
+    def __init__(self):
+        self.content_files = []
+
+    def append_content_file(self, content_file):
+        self.content_files.append(content_file)
+
+    def remove_content_file(self, content_file):
+        self.content_files.remove(content_file)
+
+    def get_terms(self, content_file):
+        text = " ".join(
+            [
+                content_file.properties["title"],
+                content_file.description or "",
+                html_to_text(content_file.html_content),
+            ]
+        )
+        return Counter(tokenize(text))
+
+    def generate(self, prefix_length):
+        """Returns the manifest and the shards keyed on their prefix"""
+        documents = []
+        postings = defaultdict(list)
+        content_files = sorted(self.content_files, key=lambda x: x.web_path)
+        for number, content_file in enumerate(content_files):
+            documents.append(
+                {
+                    "url": content_file.web_path,
+                    "title": content_file.properties["title"],
+                }
+            )
+            for term, count in self.get_terms(content_file).items():
+                postings[term].append([number, count])
+        shards = defaultdict(dict)
+        for term, term_postings in postings.items():
+            shards[term[:prefix_length]][term] = term_postings
+        manifest = {
+            "version": INDEX_VERSION,
+            "prefix_length": prefix_length,
+            "documents": documents,
+            "shards": sorted(shards),
+        }
+        return manifest, shards
+
+    def get_previous_outputs(self, build):
+        return [x for x in build.previous if x.startswith(f"{SEARCH_DIRNAME}{os.sep}")]
+
+    def render(self, config, public_dir, build=None):
+        if "search" not in config:
+            return
+        search_dir = os.path.join(public_dir, SEARCH_DIRNAME)
+        inputs = None
+        if build is not None:
+            # Every file of the index depends on all content files, so they share
+            # one fingerprint instead of recording each content file for each shard
+            content_inputs = build.get_inputs(self.content_files)
+            fingerprint = fingerprint_bytes(dump_json(content_inputs).encode("utf-8"))
+            inputs = {"search": fingerprint}
+            previous_outputs = self.get_previous_outputs(build)
+            # not any(...), since is_stale has to record each up-to-date output
+            stale = [
+                build.is_stale(os.path.join(public_dir, x), inputs)
+                for x in previous_outputs
+            ]
+            if previous_outputs and not any(stale):
+                return
+        prefix_length = config["search"].get("prefix_length", DEFAULT_PREFIX_LENGTH)
+        manifest, shards = self.generate(prefix_length)
+        files = {"index.json": manifest}
+        for prefix, shard in shards.items():
+            files[os.path.join("shards", f"{prefix}.json")] = shard
+        for filename, data in files.items():
+            filepath = os.path.join(search_dir, filename)
+            if build is None:
+                write_output(filepath, dump_json(data).encode("utf-8"))
+            else:
+                build.write(filepath, dump_json(data), inputs)
@@ -0,0 +1,195 @@
+"""
+Mirroring of the static directory of a site into its public directory
+"""
+import errno
+import json
+import os
+import shutil
+import sys
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from sitegen.cache import CACHE_VERSION, write_atomic
+from sitegen.output import remove_output
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+STATIC_DIRNAME = "static"
+# How files are placed in the public directory; auto tries them in this order
+MODES = ["reflink", "hardlink", "copy"]
+DEFAULT_MODE = "auto"
+# ioctl of Linux to share the data blocks of two files, see ioctl_ficlone(2)
+FICLONE = 0x40049409
+CHUNK_SIZE = 1024 * 1024
+
+
+def reflink(source, target):
+    """Copy-on-write copy, on file systems that support it like Btrfs and XFS"""
+    if fcntl is None or not sys.platform.startswith("linux"):
+        raise OSError(errno.EOPNOTSUPP, "Reflinks are not supported", source)
+    with open(source, "rb") as source_file, open(target, "wb") as target_file:
+        fcntl.ioctl(target_file.fileno(), FICLONE, source_file.fileno())
+    shutil.copystat(source, target)
+
+
+def hardlink(source, target):
+    os.link(source, target)
+
+
+def copy(source, target):
+    shutil.copy2(source, target)
+
+
+PLACE_FUNCTIONS = {"reflink": reflink, "hardlink": hardlink, "copy": copy}
+
+
+def same_content(path, other):
+    with open(path, "rb") as path_file, open(other, "rb") as other_file:
+        while True:
+            chunk = path_file.read(CHUNK_SIZE)
+            if chunk != other_file.read(CHUNK_SIZE):
+                return False
+            if not chunk:
+                return True
+
+
+class StaticFiles:
+    """Mirrors the static directory into the public directory. Files are
+    reflinked or hardlinked where the file system allows it, and copied
+    otherwise. The size and modification time of each source file is recorded,
+    so that the next sync places only the files that changed; without a record,
+    a file in the public directory with the same size and modification time or
+    the same content is left alone. Files are placed in parallel threads, and
+    files that were removed from the static directory are removed from the
+    public directory as well."""
+
+    def __init__(
+        self, static_dir, public_dir, state_path, mode=DEFAULT_MODE, full=False
+    ):
+        self.static_dir = static_dir
+        self.public_dir = public_dir
+        self.state_path = Path(state_path)
+        self.modes = list(MODES) if mode == DEFAULT_MODE else [mode]
+        self.full = full
+        self.lock = threading.Lock()
+        self.previous = self.load_state()
+        self.files = {}
+        self.placed = {x: 0 for x in MODES}
+        self.unchanged = 0
+        self.removed = 0
+        # Static files with the path of a generated file
+        self.conflicts = []
+
+    def load_state(self):
+        try:
+            with open(self.state_path, encoding="utf-8") as state_file:
+                state = json.load(state_file)
+        except (OSError, ValueError):
+            return {}
+        if state.get("version") != CACHE_VERSION:
+            return {}
+        return state["files"]
+
+    def save_state(self):
+        state = {"version": CACHE_VERSION, "files": self.files}
+        write_atomic(self.state_path, json.dumps(state))
+
+    def scan(self):
+        """Yields the path relative to the static directory and the stat result of
+        every file in it"""
+        stack = [(self.static_dir, "")]
+        while stack:
+            directory, prefix = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                relpath = os.path.join(prefix, entry.name)
+                if entry.is_dir():
+                    stack.append((entry.path, relpath))
+                elif entry.is_file():
+                    yield relpath, entry.stat()
+
+    def is_unchanged(self, relpath, stat):
+        source = os.path.join(self.static_dir, relpath)
+        target = os.path.join(self.public_dir, relpath)
+        try:
+            target_stat = os.stat(target)
+        except OSError:
+            return False
+        if not self.full and self.previous.get(relpath) == self.files[relpath]:
+            return True
+        if os.path.samestat(stat, target_stat):
+            # hardlinked
+            return True
+        if stat.st_size != target_stat.st_size:
+            return False
+        return stat.st_mtime_ns == target_stat.st_mtime_ns or same_content(
+            source, target
+        )
+
+    def place(self, relpath):
+        """Place the file at a temporary path first, so that a hardlinked file in
+        the public directory is replaced instead of written through to the static
+        directory. Returns how the file was placed."""
+        source = os.path.join(self.static_dir, relpath)
+        target = os.path.join(self.public_dir, relpath)
+        directory = os.path.dirname(target)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = os.path.join(directory, f".tmp-{uuid.uuid4().hex}")
+        while True:
+            with self.lock:
+                mode, fallback = self.modes[0], len(self.modes) > 1
+            try:
+                PLACE_FUNCTIONS[mode](source, tmp_path)
+                break
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                if not fallback:
+                    raise
+                # Most likely the file system does not support it, so it is not
+                # tried again for the other files
+                with self.lock:
+                    if mode in self.modes:
+                        self.modes.remove(mode)
+        os.replace(tmp_path, target)
+        return mode
+
+    def sync_file(self, relpath, stat):
+        if self.is_unchanged(relpath, stat):
+            return None
+        return self.place(relpath)
+
+    def sync(self, generated=()):
+        """Sync all files except those at the paths relative to the public
+        directory in generated, which are written by the build"""
+        self.placed = {x: 0 for x in MODES}
+        self.unchanged = 0
+        self.removed = 0
+        stats = dict(self.scan())
+        self.conflicts = sorted(x for x in stats if x in generated)
+        for relpath in self.conflicts:
+            del stats[relpath]
+        if not stats and not self.previous:
+            # No static directory
+            return
+        self.files = {x: [y.st_size, y.st_mtime_ns] for x, y in stats.items()}
+        with ThreadPoolExecutor() as executor:
+            for mode in executor.map(self.sync_file, stats, stats.values()):
+                if mode is None:
+                    self.unchanged += 1
+                else:
+                    self.placed[mode] += 1
+        for relpath in set(self.previous) - set(self.files) - set(generated):
+            if remove_output(os.path.join(self.public_dir, relpath), self.public_dir):
+                self.removed += 1
+        self.save_state()
+        self.previous = self.files
+        self.full = False
@@ -0,0 +1,68 @@
+"""
+Template dependency tracking for sitegen
+"""
+from jinja2 import meta
+from jinja2.exceptions import TemplateSyntaxError
+
+from sitegen.cache import fingerprint_bytes
+
+
+class TemplateDependencies:
+    """Maps each template to the templates it extends, includes or imports, so that
+    a change to a template invalidates only the pages that use it. Templates that
+    did not change since the previous dependencies were collected are not parsed
+    again."""
+
+    def __init__(self, templates, previous=None):
+        self.fingerprints = {}
+        self.references = {}
+        for name in templates.list_templates():
+            source, _, _ = templates.loader.get_source(templates, name)
+            fingerprint = fingerprint_bytes(source.encode("utf-8"))
+            self.fingerprints[name] = fingerprint
+            if previous is not None and previous.fingerprints.get(name) == fingerprint:
+                self.references[name] = previous.references[name]
+                continue
+            try:
+                ast = templates.parse(source, name)
+            except TemplateSyntaxError:
+                # Will fail when it's rendered anyway
+                self.references[name] = []
+                continue
+            self.references[name] = list(meta.find_referenced_templates(ast))
+
+    @classmethod
+    def from_state(cls, state):
+        """Dependencies as saved by get_state, to be passed as previous"""
+        dependencies = cls.__new__(cls)
+        dependencies.fingerprints = {x: y[0] for x, y in state.items()}
+        dependencies.references = {x: y[1] for x, y in state.items()}
+        return dependencies
+
+    def get_state(self):
+        """Fingerprint and references of every template, for the next build"""
+        return {x: [y, self.references[x]] for x, y in self.fingerprints.items()}
+
+    def get_closure(self, name):
+        """Names of the template and all the templates it uses, directly or
+        indirectly"""
+        closure = set()
+        stack = [name]
+        while stack:
+            current = stack.pop()
+            if current in closure:
+                continue
+            closure.add(current)
+            for reference in self.references.get(current, []):
+                if reference is None:
+                    # The name is computed at render time, so it could be any
+                    # template
+                    return closure | set(self.references)
+                stack.append(reference)
+        return closure
+
+    def get_inputs(self, name):
+        return {
+            f"templates/{template}": self.fingerprints.get(template)
+            for template in self.get_closure(name)
+        }
@@ -0,0 +1,175 @@
+import hashlib
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from common import CollectionTestBase
+from jinja2 import Environment, FileSystemLoader
+
+from sitegen.build import Build
+
+CONFIG = {"site": {"url": "http://bb.com", "title": "HELLO"}}
+
+
+class BuildTests(unittest.TestCase, CollectionTestBase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.basedir = Path(self.workdir.name)
+        (self.basedir / "templates").mkdir()
+        (self.basedir / "templates" / "single.html").write_text("{{ item }}")
+        self.output = self.basedir / "public" / "blog" / "index.html"
+        self.output.parent.mkdir(parents=True)
+        self.output.write_text("Output")
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def make_build(self, config=CONFIG, full=False):
+        templates = Environment(loader=FileSystemLoader(self.basedir / "templates"))
+        return Build(self.workdir.name, config, templates, full=full)
+
+    def test_stale_without_state(self):
+        build = self.make_build()
+        cf = self.make_content_file("blog", "the-entry", "The Entry")
+        assert build.is_stale(self.output, build.get_inputs([cf]))
+
+    def test_not_stale_after_save(self):
+        cf = self.make_content_file("blog", "the-entry", "The Entry")
+        build = self.make_build()
+        build.write(self.output, "Output", build.get_inputs([cf]))
+        build.save_state()
+        build = self.make_build()
+        assert not build.is_stale(self.output, build.get_inputs([cf]))
+
+    def test_templates_from_state(self):
+        """Templates that did not change since the last build are not parsed"""
+        build = self.make_build()
+        build.save_state()
+        with mock.patch.object(Environment, "parse") as parse:
+            build = self.make_build()
+        parse.assert_not_called()
+        assert "single.html" in build.template_dependencies.references
+
+    def test_stale_missing_output(self):
+        cf = self.make_content_file("blog", "the-entry", "The Entry")
+        build = self.make_build()
+        build.write(self.output, "Output", build.get_inputs([cf]))
+        build.save_state()
+        self.output.unlink()
+        build = self.make_build()
+        assert build.is_stale(self.output, build.get_inputs([cf]))
+
+    def test_stale_changed_content(self):
+        cf = self.make_content_file("blog", "the-entry", "The Entry")
+        build = self.make_build()
+        build.write(self.output, "Output", build.get_inputs([cf]))
+        build.save_state()
+        cf = self.make_content_file("blog", "the-entry", "The Changed Entry")
+        build = self.make_build()
+        assert build.is_stale(self.output, build.get_inputs([cf]))
+
+    def test_stale_added_content(self):
+        cf = self.make_content_file("blog", "the-entry", "The Entry")
+        build = self.make_build()
+        build.write(self.output, "Output", build.get_inputs([cf]))
+        build.save_state()
+        other = self.make_content_file("blog", "other-entry", "Other Entry")
+        build = self.make_build()
+        assert build.is_stale(self.output, build.get_inputs([cf, other]))
+
+    def test_stale_changed_template(self):
+        cf = self.make_content_file("blog", "the-entry", "The Entry")
+        build = self.make_build()
+        template = SimpleNamespace(name="single.html")
+        build.write(self.output, "Output", build.get_inputs([cf], template))
+        build.save_state()
+        (self.basedir / "templates" / "single.html").write_text("Changed")
+        build = self.make_build()
+        assert build.is_stale(self.output, build.get_inputs([cf], template))
+
+    def test_not_stale_changed_unrelated_template(self):
+        cf = self.make_content_file("blog", "the-entry", "The Entry")
+        build = self.make_build()
+        template = SimpleNamespace(name="single.html")
+        build.write(self.output, "Output", build.get_inputs([cf], template))
+        build.save_state()
+        (self.basedir / "templates" / "list.html").write_text("New")
+        build = self.make_build()
+        assert not build.is_stale(self.output, build.get_inputs([cf], template))
+
+    def test_stale_changed_config(self):
+        cf = self.make_content_file("blog", "the-entry", "The Entry")
+        build = self.make_build()
+        build.write(self.output, "Output", build.get_inputs([cf]))
+        build.save_state()
+        build = self.make_build({"site": {"url": "http://bb.com", "title": "BYE"}})
+        assert build.is_stale(self.output, build.get_inputs([cf]))
+
+    def test_full_build_ignores_state(self):
+        cf = self.make_content_file("blog", "the-entry", "The Entry")
+        build = self.make_build()
+        build.write(self.output, "Output", build.get_inputs([cf]))
+        build.save_state()
+        build = self.make_build(full=True)
+        assert build.is_stale(self.output, build.get_inputs([cf]))
+
+    def test_write_unchanged(self):
+        cf = self.make_content_file("blog", "the-entry", "The Entry")
+        build = self.make_build()
+        build.write(self.output, "Output", build.get_inputs([cf]))
+        build.save_state()
+        # Only the hash should be compared, not the file
+        self.output.write_text("Modified")
+        build = self.make_build()
+        build.write(self.output, "Output", build.get_inputs([cf]))
+        assert build.unchanged == 1
+        assert build.written == 0
+        assert build.bytes_written == 0
+        assert self.output.read_text() == "Modified"
+
+    def test_write_changed(self):
+        cf = self.make_content_file("blog", "the-entry", "The Entry")
+        build = self.make_build()
+        build.write(self.output, "Output", build.get_inputs([cf]))
+        build.save_state()
+        build = self.make_build()
+        build.write(self.output, "New output", build.get_inputs([cf]))
+        assert build.written == 1
+        assert build.bytes_written == len("New output")
+        assert self.output.read_text() == "New output"
+
+    def test_write_unchanged_without_state(self):
+        """If there is no record of a file, it is compared to the output"""
+        cf = self.make_content_file("blog", "the-entry", "The Entry")
+        build = self.make_build()
+        build.write(self.output, "Output", build.get_inputs([cf]))
+        assert build.unchanged == 1
+        build.write(self.output, "Other", build.get_inputs([cf]))
+        assert build.written == 1
+        assert self.output.read_text() == "Other"
+
+    def test_get_manifest(self):
+        cf = self.make_content_file("blog", "the-entry", "The Entry")
+        build = self.make_build()
+        template = SimpleNamespace(name="single.html")
+        build.write(self.output, "Output", build.get_inputs([cf], template))
+        assert build.get_manifest()["outputs"] == {
+            "blog/index.html": {"hash": hashlib.sha1(b"Output").hexdigest(), "size": 6}
+        }
+        assert build.get_manifest(sources=True)["outputs"]["blog/index.html"][
+            "sources"
+        ] == ["content/blog/the-entry.md", "templates/single.html"]
+
+    def test_prune(self):
+        cf = self.make_content_file("blog", "the-entry", "The Entry")
+        build = self.make_build()
+        build.write(self.output, "Output", build.get_inputs([cf]))
+        build.finish()
+        build = self.make_build()
+        build.finish()
+        assert build.removed == 1
+        assert not self.output.exists()
+        assert not self.output.parent.exists()
+        assert (self.basedir / "public").exists()
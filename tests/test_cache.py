@@ -0,0 +1,119 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from pygments.formatters import HtmlFormatter
+from pygments.lexers import PythonLexer
+
+from sitegen.cache import HighlightCache, MarkdownCache
+from sitegen.content import ContentFile
+from sitegen.convert import Converter
+
+EXTENSIONS = ["smarty", "meta"]
+
+
+class MarkdownCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self.workdir.name) / "cache"
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_get_missing(self):
+        cache = MarkdownCache(self.cache_dir, EXTENSIONS)
+        assert cache.get(b"Hello") is None
+        assert cache.misses == 1
+
+    def test_set_get(self):
+        cache = MarkdownCache(self.cache_dir, EXTENSIONS)
+        cache.set(b"title: Hello\n\nHello", "<p>Hello</p>", {"title": ["Hello"]})
+        html, meta = cache.get(b"title: Hello\n\nHello")
+        assert html == "<p>Hello</p>"
+        assert meta == {"title": ["Hello"]}
+        assert cache.hits == 1
+
+    def test_key_depends_on_extensions(self):
+        cache = MarkdownCache(self.cache_dir, EXTENSIONS)
+        cache.set(b"Hello", "<p>Hello</p>", {})
+        other_cache = MarkdownCache(self.cache_dir, EXTENSIONS + ["codehilite"])
+        assert other_cache.get(b"Hello") is None
+
+    def test_key_depends_on_encoding(self):
+        cache = MarkdownCache(self.cache_dir, EXTENSIONS)
+        cache.set(b"Hello", "<p>Hello</p>", {})
+        other_cache = MarkdownCache(self.cache_dir, EXTENSIONS, encoding="latin-1")
+        assert other_cache.get(b"Hello") is None
+
+    def test_prune(self):
+        cache = MarkdownCache(self.cache_dir, EXTENSIONS, max_size=100)
+        cache.set(b"old", "x" * 50, {})
+        old_path = cache.get_path(cache.get_key(b"old"))
+        os.utime(old_path, (time.time() - 100, time.time() - 100))
+        cache.set(b"new", "x" * 50, {})
+        cache.prune()
+        assert not old_path.exists()
+        assert cache.get(b"new") is not None
+
+
+class HighlightCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self.workdir.name) / "highlight"
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_in_memory(self):
+        cache = HighlightCache()
+        html = cache.highlight("x = 1", PythonLexer(), HtmlFormatter())
+        assert cache.misses == 1
+        with mock.patch("sitegen.cache.pygments.highlight") as mock_highlight:
+            assert cache.highlight("x = 1", PythonLexer(), HtmlFormatter()) == html
+        mock_highlight.assert_not_called()
+        assert cache.hits == 1
+
+    def test_between_builds(self):
+        html = HighlightCache(self.cache_dir).highlight(
+            "x = 1", PythonLexer(), HtmlFormatter()
+        )
+        cache = HighlightCache(self.cache_dir)
+        with mock.patch("sitegen.cache.pygments.highlight") as mock_highlight:
+            assert cache.highlight("x = 1", PythonLexer(), HtmlFormatter()) == html
+        mock_highlight.assert_not_called()
+
+    def test_key_depends_on_options(self):
+        cache = HighlightCache()
+        key = cache.get_key("x = 1", PythonLexer(), HtmlFormatter())
+        assert key == cache.get_key("x = 1", PythonLexer(), HtmlFormatter())
+        assert key != cache.get_key("x = 2", PythonLexer(), HtmlFormatter())
+        assert key != cache.get_key(
+            "x = 1", PythonLexer(stripall=True), HtmlFormatter()
+        )
+        assert key != cache.get_key("x = 1", PythonLexer(), HtmlFormatter(linenos=True))
+
+
+class ContentFileCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_use_cache(self):
+        path = Path(self.workdir.name) / "content.md"
+        path.write_text("title: Hello\n\nThe content")
+        cache = MarkdownCache(Path(self.workdir.name) / "cache", EXTENSIONS)
+        converter = Converter(cache=cache)
+        cf = ContentFile("blog", "content.md", str(path), converter=converter)
+        assert cf.html_content == "<p>The content</p>"
+        assert cache.misses == 1
+        with mock.patch("sitegen.convert.Markdown") as mock_markdown:
+            cf = ContentFile("blog", "content.md", str(path), converter=converter)
+            assert cf.html_content == "<p>The content</p>"
+            assert cf.properties["title"] == "Hello"
+            mock_markdown.assert_not_called()
+        assert cache.hits == 1
@@ -39,6 +39,15 @@ class ContentContextTests(unittest.TestCase, CollectionTestBase):
         section = context.sections["blog"]
         assert len(section.content_files) == 2
 
+    def test_add_remove_content_feeds(self):
+        """The feed generator shares the date index of the context"""
+        context = ContentContext()
+        content = self.make_content_file("blog", "the-entry", "The Entry")
+        context.add_content_file(content)
+        assert list(context.feed_generator.date_index) == [content]
+        context.remove_content_file(content)
+        assert list(context.date_index) == []
+
     def test_skip_no_section(self):
         """Do not add a content file without section to any sections"""
         content = self.make_content_file("", "the-entry", "The Entry")
@@ -75,6 +84,30 @@ class ContentContextTests(unittest.TestCase, CollectionTestBase):
             "index.md",
         ]
 
+    def test_load_directory_ignore(self):
+        basedir = Path(self.workdir.name) / "content"
+        (basedir / "blog" / "drafts").mkdir(parents=True)
+        (basedir / "blog" / "blog-entry.md").write_text("Yolo")
+        (basedir / "blog" / "drafts" / "draft-entry.md").write_text("draft: false")
+        (basedir / "blog" / "notes.md").write_text("Not published")
+        context = ContentContext.load_directory(self.workdir.name, ignore=["notes.md"])
+        assert [x.name for x in context.content_files] == ["blog-entry.md"]
+
+    def test_load_directory_previous(self):
+        """Content files that did not change are taken from the previous context"""
+        basedir = Path(self.workdir.name) / "content"
+        (basedir / "blog").mkdir(parents=True)
+        (basedir / "blog" / "one.md").write_text("title: One")
+        (basedir / "blog" / "two.md").write_text("title: Two")
+        previous = ContentContext.load_directory(self.workdir.name)
+        previous_files = {x.name: x for x in previous.content_files}
+        (basedir / "blog" / "two.md").write_text("title: Two changed")
+        context = ContentContext.load_directory(self.workdir.name, previous=previous)
+        content_files = {x.name: x for x in context.content_files}
+        assert content_files["one.md"] is previous_files["one.md"]
+        assert content_files["two.md"] is not previous_files["two.md"]
+        assert content_files["two.md"].properties["title"] == "Two changed"
+
     def test_skip_draft(self):
         """If a content file is draft, just ignore it completely"""
         context = ContentContext()
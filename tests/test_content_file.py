@@ -9,7 +9,13 @@ from common import FakeTemplate, FakeTemplates
 from markdown import markdown
 from markupsafe import Markup
 
-from sitegen.content import ContentFile, PageContent, Section, SiteInfo
+from sitegen.content import (
+    ContentFile,
+    PageContent,
+    Section,
+    SiteInfo,
+    parse_front_matter,
+)
 
 MD_CONTENT = """title: Blog Post One
 date: 09.02.2021 15:30
@@ -33,6 +39,12 @@ class ContentFileTests(unittest.TestCase):
         cf = ContentFile("", "the-entry.md", "/tmp/the-entry.md")
         assert cf.slug == "the-entry"
 
+    def test_input_name(self):
+        cf = ContentFile("blog", "the-entry.md", "/tmp/blog/the-entry.md")
+        assert cf.input_name == "content/blog/the-entry.md"
+        cf = ContentFile("", "about.md", "/tmp/about.md")
+        assert cf.input_name == "content/about.md"
+
     def test_get_output_directory_no_section(self):
         filepath = str(self.make_content_file("content.md", "The content is this"))
         cf = ContentFile("", "the-entry.md", filepath)
@@ -183,6 +195,42 @@ The content is this""",
             "tags": "programming, software development, bash-works?",
         }
 
+    def test_front_matter(self):
+        filepath = str(
+            self.make_content_file(
+                "content.md",
+                """---
+Title: The Title
+tags: one,
+    two
+---
+title: not meta
+""",
+            )
+        )
+        cf = ContentFile("blog", "the-entry.md", filepath)
+        assert cf.front_matter == {"title": ["The Title"], "tags": ["one,", "two"]}
+
+    def test_front_matter_same_as_markdown_meta(self):
+        filepath = str(self.make_content_file("content.md", MD_CONTENT))
+        cf = ContentFile("blog", "the-entry.md", filepath)
+        _, meta = cf.converter.convert(Path(filepath).read_bytes())
+        assert cf.front_matter == meta
+
+    def test_parse_front_matter_line_endings(self):
+        md_content = "---\r\ntitle: The Title\r\ntags:\tone,\r\n\ttwo\r\n\r\nBody\r\n"
+        meta = {"title": ["The Title"], "tags": ["one,", "two"]}
+        assert parse_front_matter(md_content) == meta
+        assert parse_front_matter(md_content.replace("\r\n", "\r")) == meta
+
+    @mock.patch("sitegen.convert.Markdown")
+    def test_properties_do_not_convert(self, mock_markdown):
+        filepath = str(self.make_content_file("content.md", MD_CONTENT))
+        cf = ContentFile("blog", "the-entry.md", filepath)
+        assert cf.properties["title"] == "Blog Post One"
+        assert not cf.is_draft
+        mock_markdown.assert_not_called()
+
     def test_publish_date(self):
         filepath = str(self.make_content_file("content.md", MD_CONTENT))
         cf = ContentFile("blog", "the-entry.md", filepath)
@@ -0,0 +1,124 @@
+import codecs
+import pickle
+import threading
+import unittest
+from unittest import mock
+
+import pygments
+from markdown import Markdown
+
+from sitegen.cache import HighlightCache
+from sitegen.convert import Converter, decode_markdown
+
+TEXT = "title: Über\n\nDas Gedöns"
+
+
+class DecodeMarkdownTests(unittest.TestCase):
+    @mock.patch("sitegen.convert.chardet")
+    def test_utf8(self, mock_chardet):
+        assert decode_markdown(TEXT.encode("utf-8")) == (TEXT, "utf-8")
+        mock_chardet.detect.assert_not_called()
+
+    def test_boms(self):
+        assert decode_markdown(codecs.BOM_UTF8 + TEXT.encode("utf-8")) == (
+            TEXT,
+            "utf-8-sig",
+        )
+        assert decode_markdown(TEXT.encode("utf-16")) == (TEXT, "utf-16")
+        assert decode_markdown(TEXT.encode("utf-32")) == (TEXT, "utf-32")
+
+    def test_detect(self):
+        text = "title: Gedöns\n\n" + "Das ist ein Gedöns, das größer ist. " * 20
+        decoded, encoding = decode_markdown(text.encode("latin-1"))
+        assert decoded == text
+        assert encoding != "utf-8"
+
+    @mock.patch("sitegen.convert.chardet")
+    def test_detect_only_prefix(self, mock_chardet):
+        mock_chardet.detect.return_value = {"encoding": "latin-1"}
+        md_bytes = ("ö" * 100000).encode("latin-1")
+        assert decode_markdown(md_bytes) == ("ö" * 100000, "latin-1")
+        (detected,), _ = mock_chardet.detect.call_args
+        assert len(detected) < len(md_bytes)
+
+    def test_detect_ascii_prefix(self):
+        """If the start of the file is only ASCII, the whole file is detected"""
+        md_bytes = b"a" * 20000 + "café".encode("latin-1")
+        decoded, encoding = decode_markdown(md_bytes)
+        assert decoded.endswith("café")
+        assert encoding != "utf-8"
+
+    @mock.patch("sitegen.convert.chardet")
+    def test_fallback(self, mock_chardet):
+        mock_chardet.detect.return_value = {"encoding": None}
+        assert decode_markdown("café".encode("latin-1")) == ("café", "cp1252")
+
+    @mock.patch("sitegen.convert.chardet")
+    def test_configured_encoding(self, mock_chardet):
+        assert decode_markdown(TEXT.encode("cp1252"), "cp1252") == (TEXT, "cp1252")
+        mock_chardet.detect.assert_not_called()
+
+    def test_configured_encoding_bom(self):
+        """A byte order mark wins over the configured encoding, so that it does
+        not end up in front of the header"""
+        md_bytes = codecs.BOM_UTF8 + TEXT.encode("utf-8")
+        assert decode_markdown(md_bytes, "utf-8") == (TEXT, "utf-8-sig")
+
+
+class ConverterTests(unittest.TestCase):
+    def test_convert(self):
+        converter = Converter()
+        html, meta = converter.convert(TEXT.encode("utf-8"))
+        assert html == "<p>Das Gedöns</p>"
+        assert meta == {"title": ["Über"]}
+
+    def test_convert_encoding(self):
+        converter = Converter(encoding="cp1252")
+        html, meta = converter.convert(TEXT.encode("cp1252"))
+        assert html == "<p>Das Gedöns</p>"
+
+    def test_reuse_markdown(self):
+        converter = Converter()
+        with mock.patch("sitegen.convert.Markdown", wraps=Markdown) as mock_markdown:
+            _, meta = converter.convert(TEXT.encode("utf-8"))
+            html, other_meta = converter.convert(b"Other text")
+        mock_markdown.assert_called_once()
+        assert meta == {"title": ["Über"]}
+        assert html == "<p>Other text</p>"
+        assert other_meta == {}
+
+    def test_markdown_per_thread(self):
+        converter = Converter()
+        markdowns = []
+        thread = threading.Thread(
+            target=lambda: markdowns.append(converter.get_markdown())
+        )
+        thread.start()
+        thread.join()
+        assert converter.get_markdown() is not markdowns[0]
+
+    def test_pickle(self):
+        converter = Converter(extensions=["smarty"], encoding="latin-1")
+        converter.get_markdown()
+        unpickled = pickle.loads(pickle.dumps(converter))
+        assert unpickled.extensions == converter.extensions
+        assert unpickled.encoding == "latin-1"
+
+    def test_always_meta(self):
+        converter = Converter(extensions=["smarty"])
+        assert converter.extensions == ["smarty", "meta"]
+        html, meta = converter.convert(TEXT.encode("utf-8"))
+        assert html == "<p>Das Gedöns</p>"
+
+    def test_highlight_cache(self):
+        converter = Converter(highlight_cache=HighlightCache())
+        code = b"```python\nprint('hello')\n```\n"
+        with mock.patch(
+            "sitegen.cache.pygments.highlight", wraps=pygments.highlight
+        ) as mock_highlight:
+            html, _ = converter.convert(b"One\n\n" + code)
+            other_html, _ = converter.convert(b"Two\n\n" + code)
+        mock_highlight.assert_called_once()
+        assert '<span class="nb">print</span>' in html
+        assert html.replace("One", "Two") == other_html
+        assert converter.highlight_cache.hits == 1
@@ -1,7 +1,9 @@
+import json
 import tempfile
 import unittest
 from datetime import datetime, timedelta
 from pathlib import Path
+from unittest import mock
 
 import feedparser
 from common import CollectionTestBase, FakeTemplate, FakeTemplates
@@ -112,3 +114,121 @@ class FeedTests(unittest.TestCase, CollectionTestBase):
         parsed = feedparser.parse(feed_xml)
         assert parsed.feed.title == "Test Site RSS Feed"
         assert len(parsed.entries) == 3
+
+    def make_dated_generator(self, count):
+        fg = FeedGenerator()
+        now = datetime.now().replace(second=0, microsecond=0)
+        for index in range(count):
+            fg.append_content_file(
+                self.make_content_file(
+                    "blog",
+                    f"entry-{index}",
+                    f"Entry {index}",
+                    date=now - timedelta(hours=index),
+                )
+            )
+        return fg
+
+    def test_limit(self):
+        fg = self.make_dated_generator(5)
+        config = dict(CONFIG, feed={"limit": 2})
+        parsed = feedparser.parse(fg.generate_feed(config))
+        assert [x.title for x in parsed.entries] == ["Entry 0", "Entry 1"]
+
+    def test_full_content(self):
+        fg = self.make_dated_generator(1)
+        feed_xml = fg.generate_feed(dict(CONFIG, feed={"full_content": True}))
+        parsed = feedparser.parse(feed_xml)
+        assert parsed.entries[0].content[0].value == "<p>The content</p>"
+        assert "content:encoded" not in fg.generate_feed(CONFIG)
+
+    def test_atom(self):
+        fg = self.make_dated_generator(2)
+        config = dict(CONFIG, feed={"full_content": True})
+        parsed = feedparser.parse(fg.generate_feed(config, "atom"))
+        assert parsed.version == "atom10"
+        assert parsed.feed.title == "Test Site"
+        assert [x.link for x in parsed.entries] == [
+            "https://bb.com/blog/entry-0",
+            "https://bb.com/blog/entry-1",
+        ]
+        assert parsed.entries[0].content[0].value == "<p>The content</p>"
+
+    def test_json(self):
+        fg = self.make_dated_generator(2)
+        feed = json.loads(fg.generate_feed(CONFIG, "json"))
+        assert feed["feed_url"] == "https://bb.com/feed.json"
+        assert [x["title"] for x in feed["items"]] == ["Entry 0", "Entry 1"]
+        assert "content_html" not in feed["items"][0]
+
+    def test_render_formats(self):
+        fg = self.make_dated_generator(2)
+        public_dir = Path(self.workdir.name) / "public"
+        config = dict(CONFIG, feed={"formats": ["atom", "json"]})
+        with mock.patch.object(
+            fg, "select_items", wraps=fg.select_items
+        ) as select_items:
+            fg.render(config, str(public_dir))
+        select_items.assert_called_once()
+        assert (public_dir / "atom.xml").exists()
+        assert (public_dir / "feed.json").exists()
+        assert not (public_dir / "rss.xml").exists()
+
+    def test_get_feeds(self):
+        fg = FeedGenerator()
+        fg.append_content_file(
+            self.make_content_file("blog", "one", "One", tags=["tech"])
+        )
+        fg.append_content_file(self.make_content_file("blog", "two", "Two"))
+        fg.append_content_file(self.make_content_file("", "index", ""))
+        feeds = fg.get_feeds(CONFIG)
+        assert [(x.title, x.directory, len(x.content_files)) for x in feeds] == [
+            ("Test Site", "", 2),
+            ("Test Site: blog", "blog", 2),
+            ("Test Site: tech", "tag/tech", 1),
+        ]
+        config = dict(CONFIG, feed={"sections": False, "tags": False})
+        assert [x.directory for x in fg.get_feeds(config)] == [""]
+
+    def test_select_items(self):
+        fg = FeedGenerator()
+        now = datetime.now().replace(second=0, microsecond=0)
+        for index, (section, tags) in enumerate(
+            [("blog", ["tech"]), ("blog", []), ("notes", ["tech"]), ("blog", ["tech"])]
+        ):
+            fg.append_content_file(
+                self.make_content_file(
+                    section,
+                    f"entry-{index}",
+                    f"Entry {index}",
+                    tags=tags,
+                    date=now - timedelta(hours=index),
+                )
+            )
+        items = fg.select_items(fg.get_feeds(CONFIG), 2)
+        titles = {
+            key: [x.properties["title"] for x in value] for key, value in items.items()
+        }
+        assert titles == {
+            "": ["Entry 0", "Entry 1"],
+            "blog": ["Entry 0", "Entry 1"],
+            "notes": ["Entry 2"],
+            "tag/tech": ["Entry 0", "Entry 2"],
+        }
+
+    def test_render_section_and_tag_feeds(self):
+        fg = FeedGenerator()
+        fg.append_content_file(
+            self.make_content_file("blog", "one", "One", tags=["tech"])
+        )
+        fg.append_content_file(self.make_content_file("notes", "two", "Two"))
+        public_dir = Path(self.workdir.name) / "public"
+        fg.render(CONFIG, str(public_dir))
+        parsed = feedparser.parse((public_dir / "blog" / "rss.xml").read_text())
+        assert parsed.feed.title == "Test Site: blog RSS Feed"
+        assert parsed.feed.link == "https://bb.com/blog/rss.xml"
+        assert [x.title for x in parsed.entries] == ["One"]
+        parsed = feedparser.parse((public_dir / "tag" / "tech" / "rss.xml").read_text())
+        assert [x.title for x in parsed.entries] == ["One"]
+        parsed = feedparser.parse((public_dir / "rss.xml").read_text())
+        assert len(parsed.entries) == 2
@@ -0,0 +1,40 @@
+import unittest
+from datetime import datetime
+from types import SimpleNamespace as Bunch
+
+from sitegen.index import DateIndex
+
+
+def make_file(name, day):
+    return Bunch(name=name, publish_date=datetime(2022, 1, day))
+
+
+class DateIndexTests(unittest.TestCase):
+    def test_order(self):
+        files = [make_file(name, day) for name, day in [("a", 2), ("b", 5), ("c", 1)]]
+        index = DateIndex(files)
+        assert [x.name for x in index] == ["b", "a", "c"]
+        assert index.newest_date == datetime(2022, 1, 5)
+        assert len(index) == 3
+
+    def test_same_date_keeps_order(self):
+        files = [make_file(name, 3) for name in "abc"]
+        index = DateIndex(files)
+        sorted_files = sorted(files, key=lambda x: x.publish_date, reverse=True)
+        assert list(index) == sorted_files
+
+    def test_remove(self):
+        first, second = make_file("a", 2), make_file("b", 5)
+        index = DateIndex([first, second])
+        # the date changed since it was added
+        second.publish_date = datetime(2022, 1, 1)
+        index.remove(second)
+        assert list(index) == [first]
+        assert index.newest_date == datetime(2022, 1, 2)
+        with self.assertRaises(ValueError):
+            index.remove(second)
+
+    def test_empty(self):
+        index = DateIndex()
+        assert index.newest_date is None
+        assert list(index) == []
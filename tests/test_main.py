@@ -40,3 +40,59 @@ class ConfigSchemaTests(unittest.TestCase):
         }
         with pytest.raises(main.SitegenConfigurationError) as context:
             config = main.load_config()
+
+    @mock.patch("sitegen.main.toml")
+    def test_load_config_encoding(self, mock_toml):
+        mock_toml.load.return_value = {
+            "site": {
+                "url": "http://bb.com",
+                "title": "HELLO",
+                "author": "Sid Vicious",
+                "locale": "en-US",
+                "encoding": "latin-1",
+            }
+        }
+        config = main.load_config()
+        assert config["site"]["encoding"] == "latin-1"
+
+    @mock.patch("sitegen.main.toml")
+    def test_load_config_invalid_encoding(self, mock_toml):
+        mock_toml.load.return_value = {
+            "site": {
+                "url": "http://bb.com",
+                "title": "HELLO",
+                "author": "Sid Vicious",
+                "locale": "en-US",
+                "encoding": "klingon",
+            }
+        }
+        with pytest.raises(main.SitegenConfigurationError) as context:
+            config = main.load_config()
+
+    @mock.patch("sitegen.main.toml")
+    def test_load_config_content_ignore(self, mock_toml):
+        mock_toml.load.return_value = {
+            "site": {
+                "url": "http://bb.com",
+                "title": "HELLO",
+                "author": "Sid Vicious",
+                "locale": "en-US",
+            },
+            "content": {"ignore": ["attachments/", "*.psd"]},
+        }
+        config = main.load_config()
+        assert config["content"]["ignore"] == ["attachments/", "*.psd"]
+
+    @mock.patch("sitegen.main.toml")
+    def test_load_config_invalid_paginate(self, mock_toml):
+        mock_toml.load.return_value = {
+            "site": {
+                "url": "http://bb.com",
+                "title": "HELLO",
+                "author": "Sid Vicious",
+                "locale": "en-US",
+                "paginate": 0,
+            }
+        }
+        with pytest.raises(main.SitegenConfigurationError):
+            main.load_config()
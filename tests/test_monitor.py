@@ -0,0 +1,211 @@
+import tempfile
+import threading
+import time
+import unittest
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+from watchdog.events import (
+    DirCreatedEvent,
+    DirModifiedEvent,
+    FileDeletedEvent,
+    FileModifiedEvent,
+    FileMovedEvent,
+)
+
+from sitegen.monitor import EventHandler, RequestHandler
+from sitegen.output import MemoryOutput
+
+BASEDIR = "/tmp/site"
+
+
+class EventHandlerTests(unittest.TestCase):
+    def setUp(self):
+        self.site = mock.Mock(basedir=BASEDIR)
+        self.handler = EventHandler(self.site, delay=0)
+
+    def process(self):
+        self.handler.apply_changes(*self.handler.take_changes())
+
+    def test_content_modified(self):
+        self.handler.dispatch(FileModifiedEvent(f"{BASEDIR}/content/blog/post.md"))
+        self.process()
+        self.site.update_content.assert_called_once_with(
+            Path(f"{BASEDIR}/content/blog/post.md")
+        )
+        self.site.build.assert_called_once_with()
+
+    def test_content_deleted(self):
+        self.handler.dispatch(FileDeletedEvent(f"{BASEDIR}/content/blog/post.md"))
+        self.process()
+        self.site.update_content.assert_called_once_with(
+            Path(f"{BASEDIR}/content/blog/post.md")
+        )
+        self.site.build.assert_called_once_with()
+
+    def test_content_moved(self):
+        self.handler.dispatch(
+            FileMovedEvent(
+                f"{BASEDIR}/content/blog/.post.md.tmp",
+                f"{BASEDIR}/content/blog/post.md",
+            )
+        )
+        self.process()
+        assert self.site.update_content.call_args_list == [
+            mock.call(Path(f"{BASEDIR}/content/blog/.post.md.tmp")),
+            mock.call(Path(f"{BASEDIR}/content/blog/post.md")),
+        ]
+        self.site.build.assert_called_once_with()
+
+    def test_coalesce_events(self):
+        """Many events for a few files lead to a single build"""
+        for _ in range(10):
+            self.handler.dispatch(FileModifiedEvent(f"{BASEDIR}/content/post.md"))
+            self.handler.dispatch(FileModifiedEvent(f"{BASEDIR}/templates/list.html"))
+        self.handler.dispatch(FileDeletedEvent(f"{BASEDIR}/content/other.md"))
+        self.process()
+        assert self.site.update_content.call_args_list == [
+            mock.call(Path(f"{BASEDIR}/content/post.md")),
+            mock.call(Path(f"{BASEDIR}/content/other.md")),
+        ]
+        self.site.build.assert_called_once_with()
+
+    def test_wait_for_quiet(self):
+        handler = EventHandler(self.site, delay=0.2)
+        handler.dispatch(FileModifiedEvent(f"{BASEDIR}/content/post.md"))
+
+        def late_event():
+            time.sleep(0.1)
+            handler.dispatch(FileModifiedEvent(f"{BASEDIR}/content/other.md"))
+
+        thread = threading.Thread(target=late_event)
+        start = time.monotonic()
+        thread.start()
+        changes, _ = handler.take_changes()
+        thread.join()
+        assert time.monotonic() - start >= 0.3
+        assert len(changes) == 2
+
+    def test_content_directory_created(self):
+        self.handler.dispatch(DirCreatedEvent(f"{BASEDIR}/content/blog"))
+        self.process()
+        self.site.reload_content.assert_called_once_with()
+        self.site.update_content.assert_not_called()
+        self.site.build.assert_called_once_with()
+
+    def test_skip_directory_modified(self):
+        self.handler.dispatch(DirModifiedEvent(f"{BASEDIR}/content/blog"))
+        assert self.handler.pending == {}
+
+    def test_template_modified(self):
+        self.handler.dispatch(FileModifiedEvent(f"{BASEDIR}/templates/single.html"))
+        self.process()
+        self.site.update_content.assert_not_called()
+        self.site.build.assert_called_once_with()
+
+    def test_static_modified(self):
+        self.handler.dispatch(FileModifiedEvent(f"{BASEDIR}/static/style.css"))
+        self.handler.dispatch(DirCreatedEvent(f"{BASEDIR}/content/blog"))
+        self.process()
+        self.site.update_static.assert_called_once_with()
+        self.site.update_content.assert_not_called()
+        self.site.build.assert_called_once_with()
+
+    def test_skip_public(self):
+        self.handler.dispatch(FileModifiedEvent(f"{BASEDIR}/public/index.html"))
+        assert self.handler.pending == {}
+
+    def test_skip_emacs_backup(self):
+        self.handler.dispatch(FileModifiedEvent(f"{BASEDIR}/content/.#post.md"))
+        assert self.handler.pending == {}
+
+
+class RequestHandlerTests(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        public = Path(self.workdir.name)
+        (public / "blog").mkdir()
+        (public / "blog" / "index.html").write_text("The blog")
+        (public / "style.css").write_text("body {}")
+        RequestHandler.BASE = self.workdir.name
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), RequestHandler)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={"poll_interval": 0.01}
+        )
+        self.thread.start()
+        self.connection = HTTPConnection("127.0.0.1", self.server.server_port)
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.workdir.cleanup()
+
+    def get(self, path, headers=None):
+        self.connection.request("GET", path, headers=headers or {})
+        response = self.connection.getresponse()
+        return response, response.read()
+
+    def test_get(self):
+        response, body = self.get("/blog/")
+        assert response.status == 200
+        assert body == b"The blog"
+        assert response.getheader("Content-type") == "text/html"
+        assert response.getheader("ETag")
+        assert response.getheader("Last-Modified")
+
+    def test_keep_alive(self):
+        """Both requests are answered on the same connection"""
+        _, body = self.get("/blog/")
+        assert body == b"The blog"
+        sock = self.connection.sock
+        _, body = self.get("/style.css")
+        assert body == b"body {}"
+        assert self.connection.sock is sock
+
+    def test_if_none_match(self):
+        response, _ = self.get("/style.css")
+        etag = response.getheader("ETag")
+        response, body = self.get("/style.css", {"If-None-Match": etag})
+        assert response.status == 304
+        assert body == b""
+        (Path(self.workdir.name) / "style.css").write_text("body {color: red}")
+        response, body = self.get("/style.css", {"If-None-Match": etag})
+        assert response.status == 200
+        assert body == b"body {color: red}"
+
+    def test_if_modified_since(self):
+        response, _ = self.get("/style.css")
+        last_modified = response.getheader("Last-Modified")
+        response, _ = self.get("/style.css", {"If-Modified-Since": last_modified})
+        assert response.status == 304
+
+    def test_redirect_directory(self):
+        response, _ = self.get("/blog")
+        assert response.status == 301
+
+    def test_not_found(self):
+        response, _ = self.get("/missing.html")
+        assert response.status == 404
+
+    def test_get_from_store(self):
+        store = MemoryOutput(self.workdir.name)
+        store.write(Path(self.workdir.name) / "blog" / "index.html", b"From memory")
+        RequestHandler.STORE = store
+        try:
+            response, body = self.get("/blog/")
+            assert body == b"From memory"
+            etag = response.getheader("ETag")
+            response, body = self.get("/blog/", {"If-None-Match": etag})
+            assert response.status == 304
+            response, _ = self.get("/blog")
+            assert response.status == 301
+            assert response.getheader("Location") == "/blog/"
+            # Not in the store, so from the disk
+            _, body = self.get("/style.css")
+            assert body == b"body {}"
+        finally:
+            RequestHandler.STORE = None
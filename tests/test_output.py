@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from sitegen.output import FileOutput, MemoryOutput
+
+
+class FileOutputTests(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.public_dir = Path(self.workdir.name) / "public"
+        self.public_dir.mkdir()
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_write(self):
+        output = FileOutput(str(self.public_dir))
+        filepath = self.public_dir / "blog" / "index.html"
+        output.write(filepath, b"The blog")
+        assert output.exists(filepath)
+        assert output.has_content(filepath, b"The blog")
+        assert not output.has_content(filepath, b"The blog!")
+
+    def test_write_hardlinked(self):
+        """A hardlinked file is replaced, not written through"""
+        source = Path(self.workdir.name) / "style.css"
+        source.write_text("body {}")
+        filepath = self.public_dir / "style.css"
+        os.link(source, filepath)
+        FileOutput(str(self.public_dir)).write(filepath, b"Generated")
+        assert filepath.read_text() == "Generated"
+        assert source.read_text() == "body {}"
+        assert os.listdir(self.public_dir) == ["style.css"]
+
+    def test_remove(self):
+        output = FileOutput(str(self.public_dir))
+        filepath = self.public_dir / "blog" / "post" / "index.html"
+        output.write(filepath, b"The post")
+        assert output.remove(filepath)
+        assert not (self.public_dir / "blog").exists()
+        assert self.public_dir.exists()
+        assert not output.remove(filepath)
+
+
+class MemoryOutputTests(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.public_dir = Path(self.workdir.name) / "public"
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_write(self):
+        output = MemoryOutput(str(self.public_dir))
+        filepath = self.public_dir / "blog" / "index.html"
+        output.write(filepath, b"The blog")
+        assert output.exists(filepath)
+        assert output.has_content(filepath, b"The blog")
+        assert not output.has_content(filepath, b"The blog!")
+        data, _ = output.get("blog/index.html")
+        assert data == b"The blog"
+        assert not self.public_dir.exists()
+
+    def test_remove(self):
+        output = MemoryOutput(str(self.public_dir))
+        filepath = self.public_dir / "blog" / "index.html"
+        output.write(filepath, b"The blog")
+        assert output.remove(filepath)
+        assert not output.exists(filepath)
+        assert output.get("blog/index.html") is None
+        assert not output.remove(filepath)
+
+    def test_flush(self):
+        output = MemoryOutput(str(self.public_dir), flush=True)
+        filepath = self.public_dir / "blog" / "index.html"
+        output.write(filepath, b"The blog")
+        output.flush_queue.join()
+        assert filepath.read_bytes() == b"The blog"
+        output.remove(filepath)
+        output.flush_queue.join()
+        assert not filepath.exists()
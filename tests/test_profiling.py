@@ -0,0 +1,61 @@
+import unittest
+from unittest import mock
+
+from sitegen.profiling import Profiler, measure
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ProfilerTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch("sitegen.profiling.time")
+        mock_time = patcher.start()
+        self.addCleanup(patcher.stop)
+        mock_time.perf_counter = self.clock
+        mock_time.process_time = self.clock
+
+    def test_measure_without_profiler(self):
+        with measure(None, "scan"):
+            pass
+
+    def test_nested_phases(self):
+        profiler = Profiler()
+        with profiler.measure("render", "single.html"):
+            self.clock.now += 1
+            with profiler.measure("markdown"):
+                self.clock.now += 2
+            self.clock.now += 3
+        assert profiler.phases["render"] == [4, 4]
+        assert profiler.phases["markdown"] == [2, 2]
+        # The template is charged with the time of the phases inside it
+        assert profiler.templates["single.html"] == [6, 1]
+
+    def test_pages(self):
+        profiler = Profiler()
+        with profiler.measure_page("blog/post1/index.html"):
+            self.clock.now += 2
+        with profiler.measure_page("blog/post2/index.html"):
+            self.clock.now += 1
+        assert profiler.pages == {
+            "blog/post1/index.html": 2,
+            "blog/post2/index.html": 1,
+        }
+
+    def test_report(self):
+        profiler = Profiler()
+        for name, seconds in [("a.html", 1), ("b.html", 3), ("c.html", 2)]:
+            with profiler.measure_page(name), profiler.measure("render", name):
+                self.clock.now += seconds
+        report = profiler.report(count=2)
+        assert "render" in report
+        assert "b.html" in report
+        assert "c.html" in report
+        assert report.index("b.html") < report.index("c.html")
+        assert "a.html" not in report
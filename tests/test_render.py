@@ -1,11 +1,16 @@
+import json
+import os
 import shutil
 import tempfile
 import unittest
 from pathlib import Path
+from unittest import mock
 
 import feedparser
 
 from sitegen import content
+from sitegen.output import MemoryOutput
+from sitegen.profiling import Profiler
 
 CONFIG = {
     "site": {
@@ -132,3 +137,492 @@ This is post1
         parsed = feedparser.parse(rss_file.read_text())
         assert parsed.feed.title == "HELLO RSS Feed"
         assert len(parsed.entries) == 3
+
+    def test_render_incremental(self):
+        contents = {
+            "content": {
+                "index.md": "This is content",
+                "blog": {"post1.md": "This is post1", "post2.md": "This is post2"},
+                "review": {"review1.md": "This is review 1"},
+            },
+            "templates": {
+                "index.html": """{{ item.html_content }}""",
+                "single.html": """{{ item.html_content }}""",
+                "list.html": """{% for item in items %}Link: {{ item.web_path }}{% endfor %}""",
+            },
+        }
+        base = Path(self.workdir.name)
+        make_dirs_and_files(base, contents)
+        content.generate_site(str(base), CONFIG)
+        public = base / "public"
+        untouched = [
+            public / "index.html",
+            public / "blog" / "post2" / "index.html",
+            public / "review" / "index.html",
+            public / "review" / "review1" / "index.html",
+        ]
+        for path in untouched:
+            path.write_text("Not rendered again")
+
+        (base / "content" / "blog" / "post1.md").write_text("Post1 changed")
+        content.generate_site(str(base), CONFIG)
+
+        for path in untouched:
+            assert path.read_text() == "Not rendered again"
+        post_page = public / "blog" / "post1" / "index.html"
+        assert post_page.read_text() == "<p>Post1 changed</p>"
+
+    def test_render_incremental_template_change(self):
+        contents = {
+            "content": {"index.md": "This is content"},
+            "templates": {"index.html": """{{ item.html_content }}"""},
+        }
+        base = Path(self.workdir.name)
+        make_dirs_and_files(base, contents)
+        content.generate_site(str(base), CONFIG)
+        (base / "templates" / "index.html").write_text("Changed")
+        content.generate_site(str(base), CONFIG)
+        assert (base / "public" / "index.html").read_text() == "Changed"
+
+    def test_render_no_cache_renders_all(self):
+        contents = {
+            "content": {"index.md": "This is content"},
+            "templates": {"index.html": """{{ item.html_content }}"""},
+        }
+        base = Path(self.workdir.name)
+        make_dirs_and_files(base, contents)
+        content.generate_site(str(base), CONFIG)
+        index = base / "public" / "index.html"
+        index.write_text("Not rendered again")
+        content.generate_site(str(base), CONFIG, use_cache=False)
+        assert index.read_text() == "<p>This is content</p>"
+
+    def test_render_jobs(self):
+        contents = {
+            "content": {
+                "index.md": "This is content",
+                "blog": {f"post{i}.md": f"This is post{i}" for i in range(10)},
+            },
+            "templates": {
+                "index.html": """{{ item.html_content }}""",
+                "single.html": """{{ item.html_content }}""",
+                "list.html": """{% for item in items|sort(attribute="name") %}{{ item.html_content }}{% endfor %}""",
+            },
+        }
+        base = Path(self.workdir.name)
+        make_dirs_and_files(base, contents)
+
+        content.generate_site(str(base), CONFIG, use_cache=False, jobs=3)
+
+        for i in range(10):
+            post_page = base / "public" / "blog" / f"post{i}" / "index.html"
+            assert post_page.read_text() == f"<p>This is post{i}</p>"
+        section_index = base / "public" / "blog" / "index.html"
+        assert section_index.read_text() == "".join(
+            f"<p>This is post{i}</p>" for i in range(10)
+        )
+
+    def test_render_jobs_compiled_templates(self):
+        contents = {
+            "content": {"blog": {f"post{i}.md": f"This is post{i}" for i in range(4)}},
+            "templates": {
+                "single.html": """{{ item.html_content }}""",
+                "list.html": """{% for item in items %}{{ item.web_path }}{% endfor %}""",
+                "broken.html": """{% if %}""",
+            },
+        }
+        base = Path(self.workdir.name)
+        make_dirs_and_files(base, contents)
+
+        content.generate_site(str(base), CONFIG, jobs=2)
+
+        post_page = base / "public" / "blog" / "post1" / "index.html"
+        assert post_page.read_text() == "<p>This is post1</p>"
+        # single.html and list.html, compiled before the workers were started
+        compiled = list((base / ".sitegen" / "templates").iterdir())
+        assert len(compiled) == 2
+
+    def test_static_files(self):
+        contents = {
+            "content": {"blog": {"post1.md": "This is post1"}},
+            "static": {"css": {"style.css": "body {}"}},
+            "templates": {
+                "single.html": """{{ item.html_content }}""",
+                "list.html": """List""",
+            },
+        }
+        base = Path(self.workdir.name)
+        make_dirs_and_files(base, contents)
+        report_path = base / "report.json"
+        content.generate_site(str(base), CONFIG, report_path=str(report_path))
+        assert (base / "public" / "css" / "style.css").read_text() == "body {}"
+        assert (
+            sum(json.loads(report_path.read_text())["static"]["placed"].values()) == 1
+        )
+        manifest = json.loads((base / "public" / "sitegen-manifest.json").read_text())
+        assert "css/style.css" not in manifest["outputs"]
+
+        (base / "static" / "css" / "style.css").unlink()
+        content.generate_site(str(base), CONFIG)
+        assert not (base / "public" / "css").exists()
+        assert (base / "public" / "blog" / "post1" / "index.html").exists()
+
+    def test_static_file_conflict(self):
+        """A static file at the path of a generated file is skipped, and never
+        overwritten, even if it was hardlinked"""
+        contents = {
+            "content": {"blog": {"post1.md": "This is post1"}},
+            "static": {"rss.xml": "Static feed", "robots.txt": "Robots"},
+            "templates": {
+                "single.html": """{{ item.html_content }}""",
+                "list.html": """List""",
+            },
+        }
+        base = Path(self.workdir.name)
+        make_dirs_and_files(base, contents)
+        config = dict(CONFIG, static={"mode": "hardlink"})
+        for _ in range(2):
+            content.generate_site(str(base), config)
+            assert (base / "static" / "rss.xml").read_text() == "Static feed"
+            assert (base / "public" / "rss.xml").read_text().startswith("<?xml")
+            assert (base / "public" / "robots.txt").samefile(
+                base / "static" / "robots.txt"
+            )
+
+    def test_compile_templates(self):
+        base = Path(self.workdir.name)
+        make_dirs_and_files(
+            base,
+            {
+                "templates": {
+                    "single.html": "{{ item.title }}",
+                    "broken.html": "{% if %}",
+                }
+            },
+        )
+        cache_dir = base / ".sitegen" / "templates"
+        templates = content.make_environment(str(base / "templates"), str(cache_dir))
+        assert content.compile_templates(templates) == 1
+        assert len(list(cache_dir.iterdir())) == 1
+
+        templates = content.make_environment(str(base / "templates"), str(cache_dir))
+        with mock.patch.object(templates, "compile") as compile_template:
+            templates.get_template("single.html")
+        compile_template.assert_not_called()
+
+    def test_render_skip_unchanged_output(self):
+        contents = {
+            "content": {"blog": {"post1.md": "This is post1"}},
+            "templates": {
+                "single.html": """{{ item.html_content }}""",
+                "list.html": """{% for item in items %}Link: {{ item.web_path }}{% endfor %}""",
+            },
+        }
+        base = Path(self.workdir.name)
+        make_dirs_and_files(base, contents)
+        content.generate_site(str(base), CONFIG)
+        section_index = base / "public" / "blog" / "index.html"
+        os.utime(section_index, ns=(0, 0))
+
+        (base / "content" / "blog" / "post1.md").write_text("Post1 changed")
+        content.generate_site(str(base), CONFIG)
+
+        # The section was rendered again, but the links did not change
+        assert section_index.stat().st_mtime_ns == 0
+        assert section_index.read_text() == "Link: /blog/post1"
+
+    def test_render_remove_deleted_content(self):
+        contents = {
+            "content": {
+                "blog": {
+                    "post1.md": "tags: tech\n\nThis is post1",
+                    "post2.md": "This is post2",
+                }
+            },
+            "templates": {
+                "single.html": """{{ item.html_content }}""",
+                "list.html": """{% for item in items %}Link: {{ item.web_path }}{% endfor %}""",
+            },
+        }
+        base = Path(self.workdir.name)
+        make_dirs_and_files(base, contents)
+        content.generate_site(str(base), CONFIG)
+        public = base / "public"
+        assert (public / "tag" / "tech" / "index.html").exists()
+
+        (base / "content" / "blog" / "post1.md").unlink()
+        content.generate_site(str(base), CONFIG)
+
+        assert not (public / "blog" / "post1").exists()
+        assert not (public / "tag").exists()
+        assert (public / "blog" / "post2" / "index.html").exists()
+        manifest = json.loads((public / "sitegen-manifest.json").read_text())
+        assert sorted(manifest["outputs"]) == [
+            "blog/index.html",
+            "blog/post2/index.html",
+            "blog/rss.xml",
+            "rss.xml",
+        ]
+        assert "sources" not in manifest["outputs"]["blog/post2/index.html"]
+
+        config = {"site": dict(CONFIG["site"], manifest_sources=True)}
+        content.generate_site(str(base), config)
+        manifest = json.loads((public / "sitegen-manifest.json").read_text())
+        assert manifest["outputs"]["blog/post2/index.html"]["sources"] == [
+            "content/blog/post2.md",
+            "templates/single.html",
+        ]
+
+    def test_render_paginated(self):
+        contents = {
+            "content": {
+                "blog": {
+                    f"post{x}.md": f"date: 0{x}.01.2022 10:00\n\nPost"
+                    for x in range(1, 4)
+                }
+            },
+            "templates": {
+                "single.html": """{{ item.html_content }}""",
+                "list.html": """{% for item in items %}{{ item.web_path }} {% endfor %}"""
+                """{{ pagination.page }}/{{ pagination.pages }} {{ pagination.next_path }}""",
+            },
+        }
+        base = Path(self.workdir.name)
+        make_dirs_and_files(base, contents)
+        config = {"site": dict(CONFIG["site"], paginate=2)}
+        content.generate_site(str(base), config)
+        public = base / "public"
+        assert (public / "blog" / "index.html").read_text() == (
+            "/blog/post3 /blog/post2 1/2 /blog/page/2/"
+        )
+        assert (public / "blog" / "page" / "2" / "index.html").read_text() == (
+            "/blog/post1 2/2 None"
+        )
+
+        (base / "content" / "blog" / "post1.md").unlink()
+        content.generate_site(str(base), config)
+        assert not (public / "blog" / "page").exists()
+
+    def test_render_paginated_inputs(self):
+        """Each page depends only on its own items"""
+        contents = {
+            "content": {
+                "blog": {
+                    f"post{x}.md": f"date: 0{x}.01.2022 10:00\n\nPost"
+                    for x in range(1, 6)
+                }
+            },
+            "templates": {
+                "single.html": """{{ item.html_content }}""",
+                "list.html": """{% for item in items %}{{ item.web_path }} {% endfor %}""",
+            },
+        }
+        base = Path(self.workdir.name)
+        make_dirs_and_files(base, contents)
+        config = {"site": dict(CONFIG["site"], paginate=2)}
+        site = content.Site(str(base), config)
+        build = site.build()
+        sources = build.outputs[os.path.join("blog", "page", "3", "index.html")]
+        assert "content/blog/post1.md" in sources["inputs"]
+        assert "content/blog/post5.md" not in sources["inputs"]
+
+        post1 = base / "content" / "blog" / "post1.md"
+        post1.write_text("date: 01.01.2022 10:00\n\nChanged")
+        site.update_content(post1)
+        build = site.build()
+        # Only post1, the last page it is on and the feeds had to be rendered
+        assert build.up_to_date == 6
+
+    def test_feed_inputs(self):
+        """Feeds depend only on the items in them"""
+        contents = {
+            "content": {
+                "blog": {
+                    f"post{x}.md": f"date: 0{x}.01.2022 10:00\n\nPost"
+                    for x in range(1, 3)
+                }
+            },
+            "templates": {
+                "single.html": """{{ item.html_content }}""",
+                "list.html": """{% for item in items %}{{ item.web_path }} {% endfor %}""",
+            },
+        }
+        base = Path(self.workdir.name)
+        make_dirs_and_files(base, contents)
+        site = content.Site(str(base), dict(CONFIG, feed={"limit": 1}))
+        build = site.build()
+        assert list(build.outputs["rss.xml"]["inputs"]) == [
+            "config",
+            "content/blog/post2.md",
+        ]
+
+        post1 = base / "content" / "blog" / "post1.md"
+        post1.write_text("date: 01.01.2022 10:00\n\nChanged")
+        site.update_content(post1)
+        build = site.build()
+        # post2 and both feeds
+        assert build.up_to_date == 3
+
+    def test_profile(self):
+        contents = {
+            "content": {"blog": {"post1.md": "title: Post\n\nThis is post1"}},
+            "templates": {
+                "single.html": """{{ item.html_content }}""",
+                "list.html": """{% for item in items %}{{ item.web_path }}{% endfor %}""",
+            },
+        }
+        base = Path(self.workdir.name)
+        make_dirs_and_files(base, contents)
+        profiler = Profiler()
+        content.generate_site(str(base), CONFIG, profiler=profiler)
+        for phase in ["scan", "front matter", "markdown", "render", "write", "feeds"]:
+            assert phase in profiler.phases
+        assert set(profiler.templates) == {"single.html", "list.html"}
+        assert os.path.join("blog", "post1", "index.html") in profiler.pages
+
+    def test_report(self):
+        contents = {
+            "content": {
+                "blog": {
+                    "post1.md": "tags: tech\n\nThis is post1",
+                    "post2.md": "This is post2",
+                }
+            },
+            "templates": {
+                "single.html": """{{ item.html_content }}""",
+                "list.html": """{% for item in items %}{{ item.web_path }}{% endfor %}""",
+            },
+        }
+        base = Path(self.workdir.name)
+        make_dirs_and_files(base, contents)
+        report_path = base / "report.json"
+        content.generate_site(str(base), CONFIG, report_path=str(report_path))
+        report = json.loads(report_path.read_text())
+        assert report["counts"] == {"pages": 2, "sections": 1, "tags": 1, "feeds": 3}
+        assert report["files"]["written"] == 8
+        assert report["files"]["bytes_written"] > 0
+        assert report["caches"]["markdown"] == {
+            "hits": 0,
+            "misses": 2,
+            "hit_rate": 0,
+        }
+        assert "render" in report["phases"]
+        assert report["duration"] > 0
+
+        content.generate_site(str(base), CONFIG, report_path=str(report_path))
+        report = json.loads(report_path.read_text())
+        assert report["files"]["written"] == 0
+        assert report["files"]["up_to_date"] == 8
+        assert report["files"]["bytes_written"] == 0
+
+
+class SiteTests(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.base = Path(self.workdir.name)
+        contents = {
+            "content": {
+                "blog": {
+                    "post1.md": "tags: tech\n\nThis is post1",
+                    "post2.md": "This is post2",
+                }
+            },
+            "templates": {
+                "single.html": """{{ item.html_content }}""",
+                "list.html": """{% for item in items|sort(attribute="name") %}Link: {{ item.web_path }} {% endfor %}""",
+            },
+        }
+        make_dirs_and_files(self.base, contents)
+        self.site = content.Site(str(self.base), CONFIG)
+        self.site.build()
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_update_content_modified(self):
+        post1 = self.base / "content" / "blog" / "post1.md"
+        post1.write_text("This is post1 changed")
+        self.site.update_content(post1)
+        build = self.site.build()
+        public = self.base / "public"
+        post_page = public / "blog" / "post1" / "index.html"
+        assert post_page.read_text() == "<p>This is post1 changed</p>"
+        assert not (public / "tag").exists()
+        # Only the page of post2 did not have to be rendered again
+        assert build.up_to_date == 1
+
+    def test_update_content_unchanged(self):
+        post1 = self.base / "content" / "blog" / "post1.md"
+        content_file = self.site.content_context.get_content_file(post1)
+        self.site.update_content(post1)
+        assert self.site.content_context.get_content_file(post1) is content_file
+
+    def test_update_content_ignored(self):
+        site = content.Site(
+            str(self.base), dict(CONFIG, content={"ignore": ["notes/"]})
+        )
+        notes = self.base / "content" / "blog" / "notes"
+        notes.mkdir()
+        (notes / "todo.md").write_text("Not published")
+        site.update_content(notes / "todo.md")
+        assert site.content_context.get_content_file(notes / "todo.md") is None
+
+    def test_update_content_created(self):
+        post3 = self.base / "content" / "blog" / "post3.md"
+        post3.write_text("This is post3")
+        self.site.update_content(post3)
+        self.site.build()
+        section_index = self.base / "public" / "blog" / "index.html"
+        assert (
+            section_index.read_text()
+            == "Link: /blog/post1 Link: /blog/post2 Link: /blog/post3 "
+        )
+
+    def test_update_content_deleted(self):
+        post1 = self.base / "content" / "blog" / "post1.md"
+        post1.unlink()
+        self.site.update_content(post1)
+        self.site.build()
+        assert not (self.base / "public" / "blog" / "post1").exists()
+        assert self.site.content_context.tag_collection.content_tags == {}
+
+    def test_update_content_draft(self):
+        post1 = self.base / "content" / "blog" / "post1.md"
+        post1.write_text("draft: true\n\nThis is post1")
+        self.site.update_content(post1)
+        self.site.build()
+        assert not (self.base / "public" / "blog" / "post1").exists()
+
+    def test_template_modified(self):
+        (self.base / "templates" / "single.html").write_text("Changed")
+        self.site.build()
+        post_page = self.base / "public" / "blog" / "post1" / "index.html"
+        assert post_page.read_text() == "Changed"
+
+    def test_build_in_memory(self):
+        base = Path(self.workdir.name) / "memory"
+        base.mkdir()
+        make_dirs_and_files(
+            base,
+            {
+                "content": {"blog": {"post1.md": "This is post1"}},
+                "templates": {
+                    "single.html": """{{ item.html_content }}""",
+                    "list.html": """List""",
+                },
+            },
+        )
+        output = MemoryOutput(str(base / "public"))
+        site = content.Site(str(base), CONFIG, output=output)
+        site.build()
+        data, _ = output.get("blog/post1/index.html")
+        assert data == b"<p>This is post1</p>"
+        assert not (base / "public" / "blog").exists()
+        # The build state describes only what's in memory
+        assert not (base / ".sitegen" / "build.json").exists()
+
+        post1 = base / "content" / "blog" / "post1.md"
+        post1.unlink()
+        site.update_content(post1)
+        site.build()
+        assert output.get("blog/post1/index.html") is None
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from sitegen.scan import ContentScanner, IgnorePatterns
+
+
+class IgnorePatternsTests(unittest.TestCase):
+    def test_name(self):
+        ignore = IgnorePatterns(["*.psd", "# comment", ""])
+        assert ignore.matches("cover.psd")
+        assert ignore.matches("blog/images/cover.psd")
+        assert not ignore.matches("blog/cover.md")
+
+    def test_directory(self):
+        ignore = IgnorePatterns(["attachments/"])
+        assert ignore.matches("blog/attachments", is_dir=True)
+        assert not ignore.matches("blog/attachments")
+
+    def test_anchored(self):
+        ignore = IgnorePatterns(["/blog/old", "notes/*.md"])
+        assert ignore.matches("blog/old", is_dir=True)
+        assert not ignore.matches("other/blog/old", is_dir=True)
+        assert ignore.matches("notes/todo.md")
+        assert not ignore.matches("blog/notes/todo.md")
+
+
+class ContentScannerTests(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.contentdir = Path(self.workdir.name)
+        for path in [
+            "index.md",
+            "about.rst",
+            ".#index.md",
+            "blog/post1.md",
+            "blog/series/part1.md",
+            "blog/drafts/post2.md",
+            "blog/attachments/post1.md",
+            "blog/attachments/video.mp4",
+            "notes/todo.md",
+        ]:
+            filepath = self.contentdir / path
+            filepath.parent.mkdir(parents=True, exist_ok=True)
+            filepath.write_text("Content")
+        self.scanner = ContentScanner(
+            str(self.contentdir), ignore=["attachments/", "todo.md"]
+        )
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_scan(self):
+        found = sorted((section, name) for section, name, _, _ in self.scanner.scan())
+        assert found == [
+            ("", "index.md"),
+            ("blog", "post1.md"),
+            ("blog", "series/part1.md"),
+        ]
+
+    def test_scan_stat(self):
+        for _, name, path, stat in self.scanner.scan():
+            assert stat.st_size == os.stat(path).st_size
+
+    def test_scan_prunes_directories(self):
+        with mock.patch("sitegen.scan.os.scandir", wraps=os.scandir) as scandir:
+            list(self.scanner.scan())
+        scanned = {
+            os.path.relpath(x.args[0], self.contentdir) for x in scandir.call_args_list
+        }
+        assert scanned == {".", "blog", os.path.join("blog", "series"), "notes"}
+
+    def test_includes(self):
+        assert self.scanner.includes(str(self.contentdir / "blog" / "post1.md"))
+        assert self.scanner.includes(str(self.contentdir / "blog" / "new.md"))
+        for path in [
+            "about.rst",
+            ".#index.md",
+            "blog/drafts/post2.md",
+            "blog/attachments/post1.md",
+            "notes/todo.md",
+        ]:
+            assert not self.scanner.includes(str(self.contentdir / path))
+        assert not self.scanner.includes(os.path.join(self.workdir.name, "..", "x.md"))
@@ -0,0 +1,111 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from common import CollectionTestBase
+
+from sitegen import content
+from sitegen.search import SearchIndex, html_to_text, tokenize
+
+CONFIG = {
+    "site": {
+        "url": "http://bb.com",
+        "title": "HELLO",
+        "author": "Sid Vicious",
+        "locale": "en-US",
+    },
+    "search": {},
+}
+
+
+class TokenizeTests(unittest.TestCase):
+    def test_tokenize(self):
+        assert tokenize("Hello, World! A bänd's 2nd") == [
+            "hello",
+            "world",
+            "bänd",
+            "2nd",
+        ]
+
+    def test_html_to_text(self):
+        assert html_to_text("<p>Fish &amp; <em>chips</em></p>").split() == [
+            "Fish",
+            "&",
+            "chips",
+        ]
+
+
+class SearchIndexTests(unittest.TestCase, CollectionTestBase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_generate(self):
+        search_index = SearchIndex()
+        search_index.append_content_file(
+            self.make_content_file("blog", "first", "Cheese")
+        )
+        search_index.append_content_file(
+            self.make_content_file("blog", "second", "Chess Content")
+        )
+        manifest, shards = search_index.generate(2)
+        assert manifest["documents"] == [
+            {"url": "/blog/first", "title": "Cheese"},
+            {"url": "/blog/second", "title": "Chess Content"},
+        ]
+        assert manifest["shards"] == ["ch", "co", "th"]
+        assert shards["ch"] == {"cheese": [[0, 1]], "chess": [[1, 1]]}
+        assert shards["co"] == {"content": [[0, 1], [1, 2]]}
+
+    def test_render(self):
+        search_index = SearchIndex()
+        search_index.append_content_file(
+            self.make_content_file("blog", "first", "Cheese")
+        )
+        search_index.render(CONFIG, self.workdir.name)
+        search_dir = Path(self.workdir.name) / "search"
+        manifest = json.loads((search_dir / "index.json").read_text())
+        assert manifest["shards"] == ["ch", "co", "th"]
+        shard = json.loads((search_dir / "shards" / "ch.json").read_text())
+        assert shard == {"cheese": [[0, 1]]}
+
+    def test_render_disabled(self):
+        search_index = SearchIndex()
+        search_index.append_content_file(
+            self.make_content_file("blog", "first", "Cheese")
+        )
+        config = dict(CONFIG)
+        del config["search"]
+        search_index.render(config, self.workdir.name)
+        assert not (Path(self.workdir.name) / "search").exists()
+
+
+class RenderSearchTests(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.base = Path(self.workdir.name)
+        (self.base / "templates").mkdir()
+        (self.base / "templates" / "single.html").write_text("{{ item.html_content }}")
+        (self.base / "templates" / "list.html").write_text("list")
+        (self.base / "content" / "blog").mkdir(parents=True)
+        (self.base / "content" / "blog" / "one.md").write_text("title: One\n\nApple")
+        (self.base / "content" / "blog" / "two.md").write_text("title: Two\n\nBanana")
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_incremental(self):
+        content.generate_site(str(self.base), CONFIG)
+        shards = self.base / "public" / "search" / "shards"
+        apple_mtime = (shards / "ap.json").stat().st_mtime_ns
+
+        (self.base / "content" / "blog" / "two.md").write_text("title: Two\n\nCherry")
+        content.generate_site(str(self.base), CONFIG)
+
+        assert not (shards / "ba.json").exists()
+        assert json.loads((shards / "ch.json").read_text()) == {"cherry": [[1, 1]]}
+        # unchanged shards are not written again
+        assert (shards / "ap.json").stat().st_mtime_ns == apple_mtime
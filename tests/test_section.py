@@ -6,7 +6,7 @@ from types import SimpleNamespace as Bunch
 
 from common import CollectionTestBase, FakeTemplate, FakeTemplates
 
-from sitegen.content import PageContent, Section, SiteInfo
+from sitegen.content import PageContent, Pagination, Section, SiteInfo
 
 CONFIG = {"site": {"url": "http://bb.com", "title": "HELLO"}}
 
@@ -76,3 +76,53 @@ class SectionTests(unittest.TestCase, CollectionTestBase):
         templates = FakeTemplates([FakeTemplate("list.html")])
         rendered = section.render(CONFIG, templates, self.workdir.name)
         assert os.path.exists(os.path.join(self.workdir.name, "blog/index.html"))
+
+    def make_section(self, count):
+        section = Section("blog")
+        for index in range(count):
+            section.append_content_file(
+                self.make_content_file(
+                    "blog",
+                    f"entry-{index}",
+                    "The Entry",
+                    date=datetime(2022, 1, 1) - timedelta(days=index),
+                )
+            )
+        return section
+
+    def test_get_pages(self):
+        section = self.make_section(5)
+        config = {"site": dict(CONFIG["site"], paginate=2)}
+        pages = section.get_pages(config)
+        assert len(pages) == 3
+        assert [x.name for x in pages[1].items] == ["entry-2.md", "entry-3.md"]
+        assert pages[1].pagination == Pagination(
+            page=2,
+            pages=3,
+            per_page=2,
+            total_items=5,
+            previous_path="/blog/",
+            next_path="/blog/page/3/",
+        )
+        context = pages[1].get_context(config)
+        assert context["items"] == pages[1].items
+        assert context["pagination"] == pages[1].pagination
+        assert context["page_content"].canonical_url == "http://bb.com/blog/page/2/"
+        assert pages[2].pagination.next_path is None
+        assert [x.name for x in pages[2].items] == ["entry-4.md"]
+
+    def test_get_pages_not_paginated(self):
+        section = self.make_section(5)
+        pages = section.get_pages(CONFIG)
+        assert len(pages) == 1
+        assert len(pages[0].items) == 5
+        assert pages[0].get_context(CONFIG)["pagination"] is None
+
+    def test_render_paginated(self):
+        section = self.make_section(3)
+        config = {"site": dict(CONFIG["site"], paginate=2)}
+        templates = FakeTemplates([FakeTemplate("list.html")])
+        section.render(config, templates, self.workdir.name)
+        assert os.path.exists(os.path.join(self.workdir.name, "blog/index.html"))
+        assert os.path.exists(os.path.join(self.workdir.name, "blog/page/2/index.html"))
+        assert not os.path.exists(os.path.join(self.workdir.name, "blog/page/3"))
@@ -0,0 +1,115 @@
+import errno
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from sitegen.static import StaticFiles
+
+
+class StaticFilesTests(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.base = Path(self.workdir.name)
+        self.static = self.base / "static"
+        self.public = self.base / "public"
+        (self.static / "css").mkdir(parents=True)
+        (self.static / "css" / "style.css").write_text("body {}")
+        (self.static / "logo.svg").write_text("<svg/>")
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def make_static_files(self, mode="copy", full=False):
+        return StaticFiles(
+            str(self.static),
+            str(self.public),
+            str(self.base / ".sitegen" / "static.json"),
+            mode=mode,
+            full=full,
+        )
+
+    def test_sync(self):
+        static_files = self.make_static_files()
+        static_files.sync()
+        assert (self.public / "css" / "style.css").read_text() == "body {}"
+        assert (self.public / "logo.svg").read_text() == "<svg/>"
+        assert static_files.placed["copy"] == 2
+        assert not (self.public / "logo.svg").samefile(self.static / "logo.svg")
+
+    def test_sync_unchanged(self):
+        self.make_static_files().sync()
+        static_files = self.make_static_files()
+        with mock.patch("sitegen.static.same_content") as same_content:
+            static_files.sync()
+        # Decided by the recorded size and modification time
+        same_content.assert_not_called()
+        assert static_files.unchanged == 2
+        assert static_files.placed["copy"] == 0
+
+    def test_sync_changed(self):
+        static_files = self.make_static_files()
+        static_files.sync()
+        (self.static / "logo.svg").write_text("<svg></svg>")
+        static_files.sync()
+        assert (self.public / "logo.svg").read_text() == "<svg></svg>"
+        assert static_files.placed["copy"] == 1
+        assert static_files.unchanged == 1
+
+    def test_sync_removed(self):
+        self.make_static_files().sync()
+        (self.static / "css" / "style.css").unlink()
+        static_files = self.make_static_files()
+        static_files.sync()
+        assert static_files.removed == 1
+        assert not (self.public / "css").exists()
+        assert (self.public / "logo.svg").exists()
+
+    def test_sync_without_state(self):
+        """Files in public with the same content are left alone"""
+        (self.public / "css").mkdir(parents=True)
+        (self.public / "css" / "style.css").write_text("body {}")
+        (self.public / "logo.svg").write_text("<svg!>")
+        static_files = self.make_static_files(full=True)
+        static_files.sync()
+        assert static_files.unchanged == 1
+        assert static_files.placed["copy"] == 1
+        assert (self.public / "logo.svg").read_text() == "<svg/>"
+
+    def test_hardlink(self):
+        static_files = self.make_static_files(mode="hardlink")
+        static_files.sync()
+        assert (self.public / "logo.svg").samefile(self.static / "logo.svg")
+        assert static_files.placed["hardlink"] == 2
+        (self.static / "logo.svg").write_text("<svg></svg>")
+        static_files.sync()
+        assert static_files.unchanged == 2
+
+    def test_replace_hardlink(self):
+        """A hardlinked file in public is replaced, not written through"""
+        other = self.base / "other.svg"
+        other.write_text("<svg>other</svg>")
+        self.public.mkdir()
+        os.link(other, self.public / "logo.svg")
+        self.make_static_files().sync()
+        assert (self.public / "logo.svg").read_text() == "<svg/>"
+        assert other.read_text() == "<svg>other</svg>"
+
+    def test_auto_fallback(self):
+        error = OSError(errno.EOPNOTSUPP, "Not supported")
+        with mock.patch.dict(
+            "sitegen.static.PLACE_FUNCTIONS",
+            {"reflink": mock.Mock(side_effect=error)},
+        ):
+            static_files = self.make_static_files(mode="auto")
+            static_files.sync()
+        assert static_files.placed["hardlink"] == 2
+        assert static_files.modes == ["hardlink", "copy"]
+        assert not [x for x in os.listdir(self.public) if x.startswith(".tmp-")]
+
+    def test_no_static_directory(self):
+        shutil.rmtree(self.static)
+        self.make_static_files().sync()
+        assert not (self.base / ".sitegen" / "static.json").exists()
@@ -97,6 +97,19 @@ class ContentTagTests(unittest.TestCase, CollectionTestBase):
         assert output_path.exists()
         assert output_path.read_text().startswith("tag.html")
 
+    def test_render_paginated(self):
+        ct = ContentTag("tech")
+        for name in ["one", "two", "three"]:
+            ct.append_content_file(self.make_content_file("blog", name, "The Entry"))
+        config = {"site": dict(CONFIG["site"], paginate=1)}
+        templates = FakeTemplates([FakeTemplate("list.html")])
+        ct.render(config, templates, self.workdir.name)
+        for path in ["tag/tech", "tag/tech/page/2", "tag/tech/page/3"]:
+            assert (Path(self.workdir.name) / path / "index.html").exists()
+        pages = ct.get_pages(config)
+        assert pages[0].pagination.next_path == "/tag/tech/page/2/"
+        assert pages[1].pagination.previous_path == "/tag/tech"
+
 
 class TagCollectionTests(unittest.TestCase, CollectionTestBase):
     def setUp(self):
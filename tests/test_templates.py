@@ -0,0 +1,90 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from jinja2 import Environment, FileSystemLoader
+
+from sitegen.templates import TemplateDependencies
+
+TEMPLATES = {
+    "base.html": """<html>{% block body %}{% endblock %}{% include "partials/footer.html" %}</html>""",
+    "partials/footer.html": """{% import "macros.html" as macros %}Footer""",
+    "macros.html": """{% macro link(x) %}{{ x }}{% endmacro %}""",
+    "single.html": """{% extends "base.html" %}{% block body %}Single{% endblock %}""",
+    "list.html": """List""",
+    "tag.html": """{% include "partials/" + tag + ".html" %}""",
+}
+
+
+class TemplateDependenciesTests(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        for name, source in TEMPLATES.items():
+            path = Path(self.workdir.name) / name
+            path.parent.mkdir(exist_ok=True)
+            path.write_text(source)
+        self.templates = Environment(loader=FileSystemLoader(self.workdir.name))
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_get_closure(self):
+        dependencies = TemplateDependencies(self.templates)
+        assert dependencies.get_closure("single.html") == {
+            "single.html",
+            "base.html",
+            "partials/footer.html",
+            "macros.html",
+        }
+        assert dependencies.get_closure("list.html") == {"list.html"}
+
+    def test_get_closure_dynamic_name(self):
+        """If the name of an included template is computed, the template depends
+        on all templates"""
+        dependencies = TemplateDependencies(self.templates)
+        assert dependencies.get_closure("tag.html") == set(TEMPLATES)
+
+    def test_get_inputs(self):
+        dependencies = TemplateDependencies(self.templates)
+        inputs = dependencies.get_inputs("single.html")
+        assert set(inputs) == {
+            "templates/single.html",
+            "templates/base.html",
+            "templates/partials/footer.html",
+            "templates/macros.html",
+        }
+        (Path(self.workdir.name) / "macros.html").write_text("Changed")
+        changed = TemplateDependencies(self.templates).get_inputs("single.html")
+        assert changed["templates/macros.html"] != inputs["templates/macros.html"]
+        assert changed["templates/single.html"] == inputs["templates/single.html"]
+
+    def test_reuse_previous(self):
+        previous = TemplateDependencies(self.templates)
+        (Path(self.workdir.name) / "list.html").write_text(
+            """{% include "macros.html" %}"""
+        )
+        with mock.patch.object(
+            self.templates, "parse", wraps=self.templates.parse
+        ) as parse:
+            dependencies = TemplateDependencies(self.templates, previous=previous)
+        assert [x.args[1] for x in parse.call_args_list] == ["list.html"]
+        assert dependencies.get_closure("list.html") == {"list.html", "macros.html"}
+        assert dependencies.get_closure("single.html") == previous.get_closure(
+            "single.html"
+        )
+
+    def test_reuse_state(self):
+        state = json.loads(json.dumps(TemplateDependencies(self.templates).get_state()))
+        previous = TemplateDependencies.from_state(state)
+        with mock.patch.object(self.templates, "parse") as parse:
+            dependencies = TemplateDependencies(self.templates, previous=previous)
+        parse.assert_not_called()
+        assert dependencies.get_closure("tag.html") == set(TEMPLATES)
+        assert dependencies.get_closure("single.html") == {
+            "single.html",
+            "base.html",
+            "partials/footer.html",
+            "macros.html",
+        }